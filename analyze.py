@@ -0,0 +1,186 @@
+"""Batch-analyze a directory of WAV recordings into main.py-style CSVs.
+
+Each file is memory-mapped and streamed through the same detector and
+bioacoustic accumulator as the live loop, one row per interval, with the
+column layout main.py writes (sensor columns are left empty). Several
+files are read, resampled and indexed at once on parent threads while
+their windows share an InferencePool (one Model per worker process), so
+neither side waits on the other. Each finished file is recorded under
+<out>/.progress so an interrupted run resumes where it stopped. The daily
+CSVs are rebuilt from all finished files at the end.
+
+    python analyze.py /media/usb/recordings --out analysis [--jobs 4] [--interval-minutes 10]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import main as pipeline
+import bioacoustics
+from wavfile import WavFile
+from row_writer import RowWriter
+from pool import InferencePool, PoolModel
+from sound import InputConditioner
+
+SR = 48000
+PROGRESS_DIR = ".progress"
+
+def find_wavs(folder):
+    wavs = []
+    for root, _, files in os.walk(folder):
+        wavs.extend(os.path.join(root, f) for f in files if f.lower().endswith(".wav"))
+    return sorted(wavs)
+
+def file_key(path):
+    # Changes if the recording is replaced, so stale results aren't reused
+    st = os.stat(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()
+
+def file_start_time(path, wav, time_format):
+    if time_format:
+        try:
+            return datetime.strptime(os.path.splitext(os.path.basename(path))[0], time_format)
+        except ValueError:
+            print(f"{path}: name doesn't match {time_format}, using file time")
+    return datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=wav.duration)
+
+def analyze_file(model, path, interval_minutes, time_format, gate):
+    wav = WavFile(path)
+    start = file_start_time(path, wav, time_format)
+    detector = pipeline.make_detector(model, SR)
+    if not gate:
+        detector.gate = None
+    interval_samples = int(interval_minutes * 60 * SR)
+    rows = []
+
+    def finish(bio_acc, species_counts, offset):
+        errors = []
+        indices = pipeline.analyze_audio_data(bio_acc, errors)
+        all_birds = sorted(species_counts)
+        row = pipeline.build_cycle_row(species_counts, all_birds, {}, None,
+                                       [0], indices, timestamp=start + timedelta(seconds=offset / SR))
+        # No sensors offline; build_cycle_row fills these with 0
+        row["Light"] = row["Motion Trips"] = None
+        rows.append(row)
+        for e in errors:
+            print(f"{path}: {e}")
+
+    offset = 0
+    in_interval = 0
+    bio_acc = bioacoustics.BioacousticAccumulator(SR)
+    species_counts = defaultdict(int)
+    if wav.frames:
+        # Same gain and DC blocking as the live Stream
+        conditioner = InputConditioner()
+        for block in wav.blocks(60, sr=SR):
+            block = conditioner.process(block)
+            pos = 0
+            while pos < len(block):
+                n = min(len(block) - pos, interval_samples - in_interval)
+                chunk = block[pos:pos + n]
+                bio_acc.update(chunk)
+                for label, prob in detector.push(chunk):
+                    species_counts[label] += 1
+                pos += n
+                offset += n
+                in_interval += n
+                if in_interval == interval_samples:
+                    finish(bio_acc, species_counts, offset)
+                    bio_acc = bioacoustics.BioacousticAccumulator(SR)
+                    species_counts = defaultdict(int)
+                    detector.reset()
+                    in_interval = 0
+    # A trailing partial interval is kept if it holds at least one model window
+    if in_interval >= pipeline.MODEL_WINDOW_SIZE:
+        finish(bio_acc, species_counts, offset)
+    return rows, wav.duration
+
+def save_progress(out, key, path, rows):
+    folder = os.path.join(out, PROGRESS_DIR)
+    os.makedirs(folder, exist_ok=True)
+    tmp = os.path.join(folder, key + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"path": path, "rows": rows}, f)
+    os.replace(tmp, os.path.join(folder, key + ".json"))
+
+def load_progress(out, key):
+    try:
+        with open(os.path.join(out, PROGRESS_DIR, key + ".json")) as f:
+            return json.load(f)["rows"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def write_outputs(out, rows):
+    writer = RowWriter(out, pipeline.STATIC_HEADER)
+    by_day = defaultdict(list)
+    for row in rows:
+        day = datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S").strftime(pipeline.FILENAME_FMT)
+        by_day[day].append(row)
+    for filename, day_rows in sorted(by_day.items()):
+        day_rows.sort(key=lambda r: r["timestamp"])
+        all_birds = sorted({k for r in day_rows for k in r} - set(pipeline.STATIC_HEADER))
+        path = os.path.join(out, filename)
+        if os.path.exists(path):
+            os.remove(path)  # rebuilt from scratch with every finished file
+        pipeline.write_batch(writer, day_rows, all_birds, filename)
+    writer.close()
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("folder")
+    parser.add_argument("--out", default="analysis")
+    parser.add_argument("--model", default="model_int8")
+    parser.add_argument("--jobs", type=int, default=cpus, help="inference worker processes")
+    parser.add_argument("--threads", type=int, help="interpreter threads per worker (default: cores / jobs)")
+    parser.add_argument("--files", type=int, help="files analyzed at once (default: 2 x jobs)")
+    parser.add_argument("--interval-minutes", type=float, default=pipeline.CYCLE_MINUTES)
+    parser.add_argument("--time-format", help="strptime format of the file names, e.g. %%Y%%m%%d_%%H%%M%%S")
+    parser.add_argument("--no-gate", action="store_true", help="run the model on every window")
+    args = parser.parse_args()
+
+    wavs = find_wavs(args.folder)
+    keys = {path: file_key(path) for path in wavs}
+    todo = [p for p in wavs if load_progress(args.out, keys[p]) is None]
+    print(f"{len(wavs)} recordings, {len(wavs) - len(todo)} already done, {len(todo)} to analyze")
+
+    t0 = time.perf_counter()
+    audio_seconds = 0.0
+    if todo:
+        with InferencePool(args.model, workers=args.jobs, threads=args.threads,
+                           window_size=pipeline.MODEL_WINDOW_SIZE) as pool:
+            model = PoolModel(pool)
+            with ThreadPoolExecutor(args.files or 2 * pool.workers) as files:
+                futures = {files.submit(analyze_file, model, path, args.interval_minutes, args.time_format,
+                                        not args.no_gate): path for path in todo}
+                for done, future in enumerate(as_completed(futures), 1):
+                    path = futures[future]
+                    try:
+                        rows, duration = future.result()
+                    except RuntimeError:
+                        for f in futures:
+                            f.cancel()
+                        raise  # the pool itself failed; later files would too
+                    except Exception as e:
+                        print(f"[{done}/{len(todo)}] {path}: failed: {e}")
+                        continue
+                    save_progress(args.out, keys[path], path, rows)
+                    audio_seconds += duration
+                    print(f"[{done}/{len(todo)}] {path}: {len(rows)} intervals")
+    wall = time.perf_counter() - t0
+    if audio_seconds and wall:
+        print(f"Analyzed {audio_seconds / 3600:.2f} h of audio in {wall:.0f} s ({audio_seconds / wall:.1f}x real time)")
+
+    rows = []
+    for path in wavs:
+        file_rows = load_progress(args.out, keys[path])
+        if file_rows:
+            rows.extend(file_rows)
+    write_outputs(args.out, rows)
+
+if __name__ == "__main__":
+    main()
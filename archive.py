@@ -0,0 +1,127 @@
+import glob
+import os
+import shutil
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as e:
+    pa = pq = None
+    _pyarrow_error = e
+
+# Typed columns for the fixed part of the cycle summary
+CYCLE_COLUMNS = [
+    ("Temperature (C)", "float32"),
+    ("Temperature (F)", "float32"),
+    ("Pressure (hPa)", "float32"),
+    ("Pressure (inHg)", "float32"),
+    ("Humidity (%)", "float32"),
+    ("Gas", "float32"),
+    ("IAQ", "float32"),
+    ("Light", "int8"),
+    ("Motion Trips", "int32"),
+    ("ADI", "float32"),
+    ("ACI", "float32"),
+    ("AEI", "float32"),
+    ("BI", "float32"),
+    ("NDSI", "float32"),
+    ("Total Species", "int16"),
+    ("Total Detections", "int32"),
+    ("Temp Running Avg (C)", "float32"),
+]
+
+class DailyArchive:
+    """Columnar (Parquet) daily archive written next to the CSV outputs.
+
+    Each day has two files: <day>.cycles.parquet with typed sensor and index
+    columns, and <day>.species.parquet in long format (timestamp, species,
+    count) with the species dictionary-encoded. During the day every write
+    lands as a small, atomically renamed part file, so a power cut loses
+    nothing; when the day rotates the parts are compacted into the two
+    compressed daily files. Needs pyarrow; without it append() is a no-op.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self.enabled = pa is not None
+        if not self.enabled:
+            print(f"WARNING: Parquet archive DISABLED, pyarrow could not be imported ({_pyarrow_error}). "
+                  f"CSV output continues; run 'pip3 install pyarrow' to enable {folder}.")
+            return
+        self.compression = "zstd" if pa.Codec.is_available("zstd") else "snappy"
+        self.cycle_schema = pa.schema(
+            [("timestamp", pa.timestamp("s")), ("gps", pa.dictionary(pa.int8(), pa.string()))]
+            + [(name, pa.type_for_alias(t)) for name, t in CYCLE_COLUMNS])
+        self.species_schema = pa.schema([
+            ("timestamp", pa.timestamp("s")),
+            ("species", pa.dictionary(pa.int16(), pa.string())),
+            ("count", pa.int32()),
+        ])
+        self.current_day = None
+        # Anything left over from earlier days (e.g. before a shutdown) gets finalized
+        self.finalize_days(before=datetime.now().strftime("%Y-%m-%d"))
+
+    def _parts_dir(self, day):
+        return os.path.join(self.folder, f"{day}.parts")
+
+    def append(self, rows, static_columns):
+        if not self.enabled or not rows:
+            return
+        try:
+            by_day = {}
+            for row in rows:
+                by_day.setdefault(row["timestamp"][:10], []).append(row)
+            for day, day_rows in by_day.items():
+                if self.current_day and day != self.current_day:
+                    self.finalize_days(before=day)
+                self.current_day = day
+                self._write_part(day, day_rows, set(static_columns))
+        except Exception as e:
+            print(f"Archive write error: {e}")
+
+    def _write_part(self, day, rows, static_columns):
+        timestamps = [datetime.strptime(r["timestamp"], "%Y-%m-%d %H:%M:%S") for r in rows]
+        cycles = {"timestamp": timestamps, "gps": [r.get("gps") for r in rows]}
+        for name, _ in CYCLE_COLUMNS:
+            cycles[name] = [r.get(name) for r in rows]
+        species = {"timestamp": [], "species": [], "count": []}
+        for ts, row in zip(timestamps, rows):
+            for name, value in row.items():
+                if name not in static_columns and value:
+                    species["timestamp"].append(ts)
+                    species["species"].append(name)
+                    species["count"].append(int(value))
+
+        parts = self._parts_dir(day)
+        os.makedirs(parts, exist_ok=True)
+        stamp = timestamps[0].strftime("%H%M%S")
+        for kind, data, schema in (("cycles", cycles, self.cycle_schema), ("species", species, self.species_schema)):
+            path = os.path.join(parts, f"{kind}-{stamp}-{len(os.listdir(parts))}.parquet")
+            pq.write_table(pa.Table.from_pydict(data, schema=schema), path + ".tmp")
+            os.replace(path + ".tmp", path)
+
+    def finalize_days(self, before):
+        """Compact the part files of every day earlier than `before` (YYYY-mm-dd)."""
+        if not self.enabled:
+            return
+        for parts in sorted(glob.glob(os.path.join(self.folder, "*.parts"))):
+            day = os.path.basename(parts)[:-len(".parts")]
+            if day < before:
+                self._finalize(day)
+
+    def _finalize(self, day):
+        parts = self._parts_dir(day)
+        try:
+            for kind, schema in (("cycles", self.cycle_schema), ("species", self.species_schema)):
+                files = sorted(glob.glob(os.path.join(parts, f"{kind}-*.parquet")))
+                out = os.path.join(self.folder, f"{day}.{kind}.parquet")
+                if os.path.exists(out):
+                    files.insert(0, out)  # a day re-opened after finalizing
+                tables = [pq.read_table(f).cast(schema) for f in files]
+                table = pa.concat_tables(tables).sort_by("timestamp") if tables else schema.empty_table()
+                pq.write_table(table, out + ".tmp", compression=self.compression, use_dictionary=True)
+                os.replace(out + ".tmp", out)
+            shutil.rmtree(parts)
+            print(f"Archive for {day} finalized")
+        except Exception as e:
+            print(f"Archive finalize error for {day}: {e}. Parts kept in {parts}")
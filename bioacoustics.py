@@ -1,13 +1,41 @@
+import copy
 import numpy as np
 import librosa
 
-def compute_adi(y, sr, bands=10, band_width=100):
+N_FFT = 2048
+HOP_LENGTH = 1024
+
+class Spectrogram:
+    """Magnitude spectrogram shared by all the index functions so a signal is only STFT'd once."""
+    def __init__(self, y, sr, n_fft=N_FFT, hop_length=HOP_LENGTH):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.S = np.abs(librosa.stft(y, n_fft=n_fft, hop_length=hop_length))
+        self.freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+        self._S_db = None
+
+    @property
+    def S_db(self):
+        # dB conversion is only needed by ADI/AEI, compute it on first use
+        if self._S_db is None:
+            self._S_db = librosa.amplitude_to_db(self.S, ref=np.max)
+        return self._S_db
+
+    @property
+    def freq_bins(self):
+        # Evenly spaced bin centres as used by the band-based indices
+        return np.linspace(0, self.sr // 2, self.S.shape[0])
+
+def _get_spectrogram(y, sr, spec):
+    return spec if spec is not None else Spectrogram(y, sr)
+
+def compute_adi(y, sr, bands=10, band_width=100, spec=None):
     # Calculate the Spectrogram
-    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=1024))
-    S_db = librosa.amplitude_to_db(S, ref=np.max)
+    spec = _get_spectrogram(y, sr, spec)
+    S_db = spec.S_db
 
     # Divide the spectrum into bands and calculate ADI
-    freq_bins = np.linspace(0, sr // 2, S.shape[0])
+    freq_bins = spec.freq_bins
     adi_value = 0
     for i in range(bands):
         band_energy = S_db[(freq_bins >= i * band_width) & (freq_bins < (i + 1) * band_width)]
@@ -15,44 +43,46 @@ def compute_adi(y, sr, bands=10, band_width=100):
             adi_value += np.ptp(band_energy)  # Peak-to-Peak range as diversity measure
     return adi_value
 
-def compute_aci(y, sr):
+def compute_aci(y, sr, spec=None):
     # Calculate the acoustic complexity
-    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=1024))
+    S = _get_spectrogram(y, sr, spec).S
     aci_value = np.sum(np.var(S, axis=1))  # Sum of variances can represent complexity
     return aci_value
 
-def compute_aei(y, sr, bands=10, band_width=100):
+def compute_aei(y, sr, bands=10, band_width=100, spec=None):
     # Evenness measures based on energy distribution across frequency bands
-    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=1024))
-    S_db = librosa.amplitude_to_db(S, ref=np.max)
+    spec = _get_spectrogram(y, sr, spec)
+    S_db = spec.S_db
     total_energy = np.sum(S_db)
-    freq_bins = np.linspace(0, sr // 2, S.shape[0])
+    freq_bins = spec.freq_bins
     band_energies = [np.sum(S_db[(freq_bins >= i * band_width) & (freq_bins < (i + 1) * band_width)]) for i in range(bands)]
     aei_value = np.std(band_energies) / np.mean(band_energies) if np.mean(band_energies) != 0 else 0
     return 1 - aei_value if aei_value <= 1 else 0  # Normalized to [0,1]
 
-def compute_bi(y, sr, freq_low=2000, freq_high=8000):
+def compute_bi(y, sr, freq_low=2000, freq_high=8000, spec=None):
     # Bioacoustic Index based on frequencies within designated range
-    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=1024))
-    freqs = librosa.fft_frequencies(sr=sr, n_fft=2048)
+    spec = _get_spectrogram(y, sr, spec)
+    S, freqs = spec.S, spec.freqs
     bio_power = np.sum(S[(freqs >= freq_low) & (freqs <= freq_high)])
     total_power = np.sum(S)
     return bio_power / total_power if total_power > 0 else 0
 
-def compute_ndsi(y, sr, bio_low=2000, bio_high=8000, anthro_low=0, anthro_high=200):
+def compute_ndsi(y, sr, bio_low=2000, bio_high=8000, anthro_low=0, anthro_high=200, spec=None):
     # Calculate the NDSI: Ratio of biophony to anthrophony
-    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=1024))
-    freqs = librosa.fft_frequencies(sr=sr, n_fft=2048)
+    spec = _get_spectrogram(y, sr, spec)
+    S, freqs = spec.S, spec.freqs
     bio_power = np.sum(S[(freqs >= bio_low) & (freqs <= bio_high)])
     anthro_power = np.sum(S[(freqs >= anthro_low) & (freqs <= anthro_high)])
     return (bio_power - anthro_power) / (bio_power + anthro_power) if (bio_power + anthro_power) > 0 else 0
 
 def bioacoustic_analysis(audio_data, sr):
-    adi = compute_adi(audio_data, sr)
-    aci = compute_aci(audio_data, sr)
-    aei = compute_aei(audio_data, sr)
-    bi = compute_bi(audio_data, sr)
-    ndsi = compute_ndsi(audio_data, sr)
+    # One STFT shared by every index
+    spec = Spectrogram(audio_data, sr)
+    adi = compute_adi(audio_data, sr, spec=spec)
+    aci = compute_aci(audio_data, sr, spec=spec)
+    aei = compute_aei(audio_data, sr, spec=spec)
+    bi = compute_bi(audio_data, sr, spec=spec)
+    ndsi = compute_ndsi(audio_data, sr, spec=spec)
 
     return {
         "ADI": adi,
@@ -61,3 +91,148 @@ def bioacoustic_analysis(audio_data, sr):
         "BI": bi,
         "NDSI": ndsi
     }
+
+class BioacousticAccumulator:
+    """Streaming version of bioacoustic_analysis.
+
+    Audio blocks are pushed with update() as they arrive and only running
+    per-bin/per-band statistics are kept, so memory stays constant however
+    long the window is. The STFT is framed exactly like librosa's centred,
+    zero-padded STFT of the concatenated signal, so result() gives the same
+    indices bioacoustic_analysis would (AEI to within the 1 dB histogram
+    resolution used to apply the 80 dB floor).
+    """
+    AMIN = 1e-5
+    TOP_DB = 80.0
+    DB_MIN = -100  # 20*log10(AMIN)
+    DB_BUCKETS = 200
+
+    def __init__(self, sr, bands=10, band_width=100, bio_low=2000, bio_high=8000,
+                 anthro_low=0, anthro_high=200, n_fft=N_FFT, hop_length=HOP_LENGTH):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.bands = bands
+        n_bins = n_fft // 2 + 1
+        freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+        freq_bins = np.linspace(0, sr // 2, n_bins)
+        self.bio_mask = (freqs >= bio_low) & (freqs <= bio_high)
+        self.anthro_mask = (freqs >= anthro_low) & (freqs <= anthro_high)
+
+        # Band index for each bin used by ADI/AEI, -1 for bins outside every band
+        self.band_of_bin = np.full(n_bins, -1)
+        for i in range(bands):
+            self.band_of_bin[(freq_bins >= i * band_width) & (freq_bins < (i + 1) * band_width)] = i
+        self.band_bins = np.flatnonzero(self.band_of_bin >= 0)
+        self.reset()
+
+    def reset(self):
+        n_bins = self.n_fft // 2 + 1
+        # Start with half a window of zeros, matching librosa's center=True padding
+        self.carry = np.zeros(self.n_fft // 2, dtype='float32')
+        self.samples = 0
+        self.frames = 0
+        self.mean = np.zeros(n_bins)
+        self.m2 = np.zeros(n_bins)
+        self.s_min = np.full(n_bins, np.inf)
+        self.s_max = np.zeros(n_bins)
+        self.db_counts = np.zeros(self.bands * self.DB_BUCKETS)
+        self.db_sums = np.zeros(self.bands * self.DB_BUCKETS)
+
+    def update(self, y):
+        if y is None or len(y) == 0:
+            return
+        self.samples += len(y)
+        self._consume(np.concatenate([self.carry, np.asarray(y, dtype='float32').ravel()]))
+
+    def _consume(self, segment):
+        if len(segment) < self.n_fft:
+            self.carry = segment
+            return
+        S = np.abs(librosa.stft(segment, n_fft=self.n_fft, hop_length=self.hop_length, center=False))
+        n = S.shape[1]
+        self.carry = segment[n * self.hop_length:].copy()
+        self._add_frames(S)
+
+    def _add_frames(self, S):
+        n = S.shape[1]
+        # Merge per-bin mean/M2 (Chan et al.) for the ACI variance
+        block_mean = S.mean(axis=1, dtype=np.float64)
+        block_m2 = ((S - block_mean[:, None]) ** 2).sum(axis=1)
+        total = self.frames + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += block_m2 + delta ** 2 * self.frames * n / total
+        self.frames = total
+
+        np.minimum(self.s_min, S.min(axis=1), out=self.s_min)
+        np.maximum(self.s_max, S.max(axis=1), out=self.s_max)
+
+        # 1 dB histogram of un-referenced dB values per band for AEI
+        db = 20.0 * np.log10(np.maximum(self.AMIN, S[self.band_bins]))
+        bucket = np.clip(np.floor(db).astype(int) - self.DB_MIN, 0, self.DB_BUCKETS - 1)
+        idx = (self.band_of_bin[self.band_bins][:, None] * self.DB_BUCKETS + bucket).ravel()
+        size = self.bands * self.DB_BUCKETS
+        self.db_counts += np.bincount(idx, minlength=size)
+        self.db_sums += np.bincount(idx, weights=db.ravel(), minlength=size)
+
+    def _flush(self):
+        # Trailing half window of zeros, as librosa pads the end of the signal
+        self._consume(np.concatenate([self.carry, np.zeros(self.n_fft // 2, dtype='float32')]))
+
+    def result(self):
+        """ADI/ACI/AEI/BI/NDSI dict for everything pushed so far.
+
+        The trailing padding is applied to a copy, so result() can be called
+        repeatedly (and update() continued) without changing the outcome.
+        """
+        acc = copy.copy(self)
+        for name in ("carry", "mean", "m2", "s_min", "s_max", "db_counts", "db_sums"):
+            setattr(acc, name, getattr(self, name).copy())
+        acc._flush()
+        return acc._indices()
+
+    def _indices(self):
+        if self.frames == 0:
+            return {"ADI": 0, "ACI": 0, "AEI": 0, "BI": 0, "NDSI": 0}
+
+        ref_db = 20.0 * np.log10(max(self.AMIN, self.s_max.max()))
+        floor_db = -self.TOP_DB
+
+        def to_db(s):
+            return np.maximum(20.0 * np.log10(np.maximum(self.AMIN, s)) - ref_db, floor_db)
+
+        # ADI: dB range per band
+        adi_value = 0
+        min_db, max_db = to_db(self.s_min), to_db(self.s_max)
+        for i in range(self.bands):
+            in_band = self.band_of_bin == i
+            if in_band.any():
+                adi_value += max_db[in_band].max() - min_db[in_band].min()
+
+        aci_value = np.sum(self.m2 / self.frames)
+
+        # AEI: per-band dB sums with the top_db floor applied per bucket
+        lower = np.arange(self.DB_BUCKETS) + self.DB_MIN - ref_db
+        counts = self.db_counts.reshape(self.bands, self.DB_BUCKETS)
+        sums = self.db_sums.reshape(self.bands, self.DB_BUCKETS)
+        means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0) - ref_db
+        band_energies = np.where(lower >= floor_db, sums - ref_db * counts,
+                                 np.maximum(means, floor_db) * counts).sum(axis=1)
+        aei_value = np.std(band_energies) / np.mean(band_energies) if np.mean(band_energies) != 0 else 0
+        aei_value = 1 - aei_value if aei_value <= 1 else 0
+
+        bin_sums = self.mean * self.frames
+        total_power = np.sum(bin_sums)
+        bio_power = np.sum(bin_sums[self.bio_mask])
+        anthro_power = np.sum(bin_sums[self.anthro_mask])
+        bi = bio_power / total_power if total_power > 0 else 0
+        ndsi = (bio_power - anthro_power) / (bio_power + anthro_power) if (bio_power + anthro_power) > 0 else 0
+
+        return {
+            "ADI": adi_value,
+            "ACI": aci_value,
+            "AEI": aei_value,
+            "BI": bi,
+            "NDSI": ndsi
+        }
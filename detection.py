@@ -0,0 +1,357 @@
+import threading
+import time
+import numpy as np
+from windows import WindowAssembler
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DEGRADE = "degrade"
+
+class ActivityGate:
+    """Cheap pre-inference check that skips windows with no bird-band activity.
+
+    The window is cut into frames and the 1-10 kHz energy of each frame is
+    measured with one batched FFT. A window is active if its loudest frame
+    stands threshold_db above its median frame (a call against background),
+    or if its median is threshold_db above the slowly tracked noise floor (a
+    sustained chorus). Lower threshold_db makes the gate more sensitive.
+    """
+    def __init__(self, sr, threshold_db=6.0, low=1000, high=10000, frame_size=2048, floor_alpha=0.05):
+        self.threshold_db = threshold_db
+        self.frame_size = frame_size
+        self.floor_alpha = floor_alpha
+        freqs = np.fft.rfftfreq(frame_size, 1.0 / sr)
+        self.band = (freqs >= low) & (freqs <= high)
+        self.taper = np.hanning(frame_size).astype('float32')
+        self.reset()
+
+    def reset(self):
+        self.noise_floor = None
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.gated = 0
+        self.passed = 0
+
+    def band_energy_db(self, window):
+        n = len(window) // self.frame_size
+        frames = window[:n * self.frame_size].reshape(n, self.frame_size) * self.taper
+        power = np.abs(np.fft.rfft(frames, axis=1)[:, self.band]) ** 2
+        return 10.0 * np.log10(power.sum(axis=1) + 1e-12)
+
+    def is_active(self, window):
+        energy = self.band_energy_db(window)
+        median = np.median(energy)
+        if self.noise_floor is None:
+            self.noise_floor = median
+            active = True
+        else:
+            active = (energy.max() - median >= self.threshold_db
+                      or median - self.noise_floor >= self.threshold_db)
+            # Follow the floor down quickly and up slowly
+            alpha = self.floor_alpha if median < self.noise_floor else self.floor_alpha / 10
+            self.noise_floor += alpha * (median - self.noise_floor)
+        if active:
+            self.passed += 1
+        else:
+            self.gated += 1
+        return active
+
+class SlidingWindowDetector:
+    """Runs the model on (optionally overlapping) windows and merges detections.
+
+    Windows are cut every `hop` samples and sent through Model.predict_batch
+    in batches. A species detected in windows that overlap in time is
+    counted as one call. The real-time factor (inference seconds per second
+    of audio) is tracked, and when it goes above max_rtf the hop is doubled
+    towards the window size; it drops back to the configured hop once there
+    is headroom again.
+    """
+    def __init__(self, model, sr, window_size, hop=None, min_p=0.1, max_batch=4, max_rtf=0.8, gate=None, log=None):
+        self.model = model
+        self.gate = gate
+        self.log = log
+        self.sr = sr
+        self.window_size = window_size
+        self.min_hop = window_size if hop is None else int(hop)
+        self.min_p = min_p
+        self.max_rtf = max_rtf
+        self.assembler = WindowAssembler(window_size, self.min_hop)
+        self.batch = np.zeros((max_batch, window_size), dtype='float32')
+        self.batch_starts = [0] * max_batch
+        self.rtf = 0.0
+        self.inference_seconds = 0.0
+        self.reset()
+
+    @property
+    def hop(self):
+        return self.assembler.hop
+
+    def reset(self, origin=None):
+        # origin is the Unix time of the first sample pushed after the reset
+        self.origin = time.time() if origin is None else origin
+        self.cycle_start = 0  # stream sample the current cycle began at
+        self.backlogged = False  # set by InferenceWorker while a degrade for its queue is in force
+        self.assembler.reset()
+        self.pending = 0
+        self.last_end = {}   # species -> end sample of the last window it was heard in
+        self.windows = 0
+        self.inferred = 0
+        self.events = 0
+        if self.gate is not None:
+            # Keep the learned noise floor across cycles
+            self.gate.reset_counters()
+
+    def degrade(self):
+        # Halve the overlap; returns False once windows no longer overlap
+        hop = self.assembler.hop
+        if hop >= self.window_size:
+            return False
+        self.assembler.set_hop(min(self.window_size, hop * 2))
+        return True
+
+    def start_cycle(self):
+        """Measure detection-log offsets from here on, keeping buffered audio and the window grid."""
+        self.cycle_start = self.assembler.position + self.assembler.buffered()
+
+    def skip(self, n):
+        # Samples lost before the next chunk; keeps window offsets (and log timestamps) true
+        self.assembler.skip(n)
+
+    def iter_windows(self, audio_chunk):
+        """Yield (window, start_sample) for each window the chunk completes.
+
+        The window is a view that is only valid until the next iteration.
+        """
+        for window in self.assembler.push(audio_chunk):
+            yield window, self.assembler.position
+
+    def push(self, audio_chunk):
+        """Feed new audio and return the (label, prob) calls it completes."""
+        events = []
+        for window, start in self.iter_windows(audio_chunk):
+            # Views are only valid until the assembler moves on, so copy now
+            self.batch[self.pending] = window
+            self.batch_starts[self.pending] = start
+            self.pending += 1
+            if self.pending == len(self.batch):
+                events.extend(self.infer(self.batch[:self.pending], self.batch_starts[:self.pending]))
+                self.pending = 0
+        if self.pending:
+            events.extend(self.infer(self.batch[:self.pending], self.batch_starts[:self.pending]))
+            self.pending = 0
+        return events
+
+    def infer(self, windows, starts):
+        """Run a batch of windows and merge their detections into calls."""
+        n = len(windows)
+        t0 = time.perf_counter()
+        if self.gate is not None:
+            active = [i for i in range(n) if self.gate.is_active(windows[i])]
+            starts = [starts[i] for i in active]
+            windows = windows[active] if len(active) < n else windows
+        detections = []
+        if len(starts):
+            _, detections = self.model.predict_batch(windows, min_p=self.min_p, return_scores=False)
+        elapsed = time.perf_counter() - t0
+        self.inference_seconds += elapsed
+        self.windows += n
+        self.inferred += len(starts)
+        # Each window advances the stream by one hop
+        self._update_rtf(elapsed / (n * self.assembler.hop / self.sr))
+
+        events = []
+        for start, detected in zip(starts, detections):
+            end = start + self.window_size
+            for label, prob in detected:
+                if self.log is not None:
+                    self.log.add(self.origin + start / self.sr, (start - self.cycle_start) / self.sr, label, prob)
+                if start >= self.last_end.get(label, 0):
+                    events.append((label, prob))
+                    self.events += 1
+                self.last_end[label] = end
+        return events
+
+    def _update_rtf(self, rtf):
+        self.rtf = 0.8 * self.rtf + 0.2 * rtf
+        hop = self.assembler.hop
+        if self.rtf > self.max_rtf and hop < self.window_size:
+            self.degrade()
+            print(f"Inference too slow (RTF {self.rtf:.2f}), hop raised to {self.assembler.hop} samples")
+        elif self.rtf < self.max_rtf / 4 and hop > self.min_hop and not self.backlogged:
+            # Fast again and nothing queued: win the overlap back
+            self.assembler.set_hop(max(self.min_hop, hop // 2))
+
+class InferenceWorker:
+    """Runs a SlidingWindowDetector's inference on a background thread.
+
+    The capture loop calls submit() with new audio; completed windows are
+    copied into a fixed ring of `max_queue` slots and a worker thread runs
+    them through the model in batches (TFLite releases the GIL during
+    invoke). When the ring is full the policy decides what happens:
+    DROP_OLDEST overwrites the oldest queued window, DROP_NEWEST discards
+    the incoming one and DEGRADE reduces window overlap, keeping the window
+    in one extra slot, before falling back to dropping the oldest once
+    windows no longer overlap. Overlap isn't restored until the queue has
+    drained. Detected calls are collected with get_events().
+    """
+    def __init__(self, detector, max_queue=8, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST, DEGRADE):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.detector = detector
+        self.policy = policy
+        self.slots = np.zeros((max_queue, detector.window_size), dtype='float32')
+        self.slot_starts = [0] * max_queue
+        self.batch = np.zeros_like(detector.batch)
+        self.head = 0
+        self.depth = 0
+        self.cond = threading.Condition()
+        self.busy = threading.Lock()
+        self.events = []
+        self.errors = []
+        self.submitted = 0
+        self.dropped = 0
+        self.degraded = 0
+        self.max_depth = 0
+        self._stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._worker_thread, daemon=True)
+        self.thread.start()
+
+    def submit(self, audio_chunk):
+        """Queue the windows completed by audio_chunk. Never blocks on inference."""
+        for window, start in self.detector.iter_windows(audio_chunk):
+            with self.cond:
+                self.submitted += 1
+                capacity = len(self.slots)
+                if self.depth == capacity:
+                    if self.policy == DROP_NEWEST:
+                        self.dropped += 1
+                        continue
+                    if self.policy == DEGRADE and self.detector.degrade():
+                        # Windows now come less often, so the backlog drains; nothing is lost
+                        self.degraded += 1
+                        self.detector.backlogged = True
+                        self._grow()
+                        capacity += 1
+                    else:
+                        # Overwrite the oldest queued window
+                        self.head = (self.head + 1) % capacity
+                        self.depth -= 1
+                        self.dropped += 1
+                slot = (self.head + self.depth) % capacity
+                self.slots[slot] = window
+                self.slot_starts[slot] = start
+                self.depth += 1
+                self.max_depth = max(self.max_depth, self.depth)
+                self.cond.notify()
+
+    def _grow(self):
+        # One more slot, queued windows moved to the front in order (cond held)
+        capacity = len(self.slots)
+        order = [(self.head + i) % capacity for i in range(self.depth)]
+        slots = np.zeros((capacity + 1, self.detector.window_size), dtype='float32')
+        slots[:self.depth] = self.slots[order]
+        self.slot_starts = [self.slot_starts[i] for i in order] + [0] * (capacity + 1 - self.depth)
+        self.slots = slots
+        self.head = 0
+
+    def skip(self, n):
+        """Tell the detector n samples were lost before the next submit()."""
+        with self.cond:
+            self.detector.skip(n)
+
+    def start_cycle(self):
+        """Restart the queue-depth peak and the detector's cycle offsets; queued windows stay."""
+        with self.cond:
+            self.max_depth = self.depth
+            self.detector.start_cycle()
+
+    def _take_batch(self):
+        # Copy queued windows out under the lock so submit() can reuse the slots
+        capacity = len(self.slots)
+        n = min(self.depth, len(self.batch))
+        starts = []
+        for i in range(n):
+            slot = (self.head + i) % capacity
+            self.batch[i] = self.slots[slot]
+            starts.append(self.slot_starts[slot])
+        self.head = (self.head + n) % capacity
+        self.depth -= n
+        return n, starts
+
+    def _worker_thread(self):
+        while not self._stop_event.is_set():
+            with self.cond:
+                while self.depth == 0 and not self._stop_event.is_set():
+                    self.cond.wait(timeout=0.5)
+            with self.busy:
+                with self.cond:
+                    n, starts = self._take_batch()
+                if not n:
+                    continue
+                try:
+                    events = self.detector.infer(self.batch[:n], starts)
+                except Exception as e:
+                    events = []
+                    with self.cond:
+                        self.errors.append(f"Inference error: {e}")
+                with self.cond:
+                    self.events.extend(events)
+                    if self.depth == 0:
+                        self.detector.backlogged = False
+                    self.cond.notify_all()
+
+    def get_events(self):
+        """Return and clear the calls detected since the last call."""
+        with self.cond:
+            events, self.events = self.events, []
+            return events
+
+    def get_errors(self):
+        with self.cond:
+            errors, self.errors = self.errors, []
+            return errors
+
+    def wait_idle(self, timeout=None):
+        """Block until every queued window has been processed (or timeout)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.depth:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(timeout=remaining)
+        # Wait for the batch in flight, if any
+        acquired = self.busy.acquire(timeout=-1 if timeout is None else max(0, deadline - time.monotonic()))
+        if acquired:
+            self.busy.release()
+        return acquired
+
+    def reset(self, origin=None):
+        """Discard queued windows and restart detection and counters; origin as in SlidingWindowDetector.reset."""
+        with self.busy:
+            with self.cond:
+                self.head = 0
+                self.depth = 0
+                self.events = []
+                self.submitted = self.dropped = self.degraded = self.max_depth = 0
+                self.detector.reset(origin)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "submitted": self.submitted,
+                "inferred": self.detector.inferred,
+                "dropped": self.dropped,
+                "degraded": self.degraded,
+                "queue_depth": self.depth,
+                "max_queue_depth": self.max_depth,
+                "gated": self.detector.gate.gated if self.detector.gate else 0,
+                "rtf": self.detector.rtf,
+            }
+
+    def stop(self):
+        self._stop_event.set()
+        with self.cond:
+            self.cond.notify_all()
+        self.thread.join()
@@ -0,0 +1,64 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+LOG_HEADER = "timestamp,offset_s,species_index,probability\n"
+
+class DetectionLog:
+    """Append-only, long-format log of every window-level detection.
+
+    One line per (window, species) with a fixed schema: the window's start
+    as Unix time, its offset in seconds from the start of the cycle
+    (negative for a window that began in the previous one), the species'
+    line index in labels.txt and the probability. Rows are buffered and
+    appended in batches, to one file per day. flush() may run on several
+    threads at once; batches are written one at a time, in order.
+    """
+    def __init__(self, folder, classes, filename_fmt="detections_%Y-%m-%d.csv", flush_rows=256, flush_seconds=60):
+        self.folder = folder
+        self.filename_fmt = filename_fmt
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.class_index = {label: i for i, label in enumerate(classes)}
+        self.buffer = []
+        self.lock = threading.Lock()  # guards the buffer
+        self.write_lock = threading.Lock()  # one flush at a time writes the files
+        self.last_flush = time.monotonic()
+        self.rows_written = 0
+
+    def add(self, timestamp, offset_s, label, prob):
+        with self.lock:
+            self.buffer.append((timestamp, offset_s, self.class_index.get(label, -1), prob))
+            due = len(self.buffer) >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self):
+        # Take the buffer under the write lock too, so batches reach the files in the order they were taken
+        with self.write_lock:
+            with self.lock:
+                rows, self.buffer = self.buffer, []
+                self.last_flush = time.monotonic()
+            if not rows:
+                return
+            # Group by day so a batch straddling midnight lands in both files
+            by_file = {}
+            for row in rows:
+                filename = datetime.fromtimestamp(row[0]).strftime(self.filename_fmt)
+                by_file.setdefault(filename, []).append(f"{row[0]:.3f},{row[1]:.3f},{row[2]},{row[3]:.4f}\n")
+            for filename, lines in by_file.items():
+                path = os.path.join(self.folder, filename)
+                try:
+                    os.makedirs(self.folder, exist_ok=True)
+                    new_file = not os.path.exists(path)
+                    with open(path, "a") as f:
+                        if new_file:
+                            f.write(LOG_HEADER)
+                        f.writelines(lines)
+                    self.rows_written += len(lines)
+                except Exception as e:
+                    print(f"Detection log write error for {path}: {e}. {len(lines)} row(s) lost.")
+
+    def close(self):
+        self.flush()
@@ -1,12 +1,20 @@
+import time
+import threading
+import numpy as np
 import ST7735
 from PIL import Image, ImageDraw, ImageFont
 from fonts.ttf import RobotoMedium as UserFont
 
+LINE_HEIGHT = 10
+MAX_FPS = 5  # pushes to the panel per second; prints in between are coalesced
+GESTURE_SECONDS = 3  # hand over the light sensor this long toggles the backlight
+
 class Display:
-    def __init__(self):
+    def __init__(self, max_fps=MAX_FPS):
+        self.rotation = 270
         self.st7735 = ST7735.ST7735(
             port=0, cs=1, dc="GPIO9", backlight="GPIO12",
-            rotation=270, spi_speed_hz=10_000_000
+            rotation=self.rotation, spi_speed_hz=10_000_000
         )
         self.st7735.set_backlight(0)
 
@@ -19,9 +27,18 @@ class Display:
 
         self.left_lines = []
         self.right_lines = []
-        self.max_lines = self.HEIGHT // 10
+        self.max_lines = self.HEIGHT // LINE_HEIGHT
         self.column_width = (self.WIDTH * 2) // 3
 
+        # Lines each column currently shows, so unchanged columns aren't redrawn
+        self.drawn = {"left": None, "right": None}
+        self.dirty = []  # (x0, y0, x1, y1) regions drawn but not yet sent
+        self.min_interval = 1.0 / max_fps if max_fps else 0
+        self.last_push = 0.0
+        self.flush_timer = None  # deferred push for prints that arrived too soon after the last one
+        self.lock = threading.RLock()  # the timer thread pushes too
+        self.glyph_widths = {}  # font -> {char: width}
+
         self.on = False
 
     def turn_on(self):
@@ -37,8 +54,12 @@ class Display:
             self.on = False
 
     def clear(self):
-        self.draw.rectangle((0, 0, self.WIDTH, self.HEIGHT), fill=0)
-        self.st7735.display(self.img)
+        with self.lock:
+            self.draw.rectangle((0, 0, self.WIDTH, self.HEIGHT), fill=0)
+            self.drawn = {"left": None, "right": None}
+            self.dirty = []
+            self.st7735.display(self.img)
+            self.last_push = time.monotonic()
 
     def print_left(self, new_line, stdout=True):
         if stdout:
@@ -48,7 +69,7 @@ class Display:
         self.left_lines = self.left_lines[-self.max_lines:]
 
         self.update_display_left()
-    
+
     def clear_left(self):
         self.left_lines = []
 
@@ -64,27 +85,204 @@ class Display:
     def clear_right(self):
         self.right_lines = []
 
-    def update_display_left(self):
-        self.draw.rectangle((0, 0, self.column_width, self.HEIGHT), fill=0)
-    
-        # Draw left column with truncation
-        for i, line in enumerate(self.left_lines):
-            truncated_line = self.truncate_text(line, self.column_width)
-            self.draw.text((2, i * 10), truncated_line, font=self.font_small, fill=(255, 255, 255))
-    
-        self.st7735.display(self.img)
-
-    def update_display_right(self):
-        self.draw.rectangle((self.column_width, 0, self.WIDTH, self.HEIGHT), fill=0)
-    
-        # Draw right column with truncation
-        for i, line in enumerate(self.right_lines):
-            truncated_line = self.truncate_text(line, self.column_width - 4)  # Account for padding
-            self.draw.text((self.column_width + 2, i * 10), truncated_line, font=self.font_small, fill=(255, 255, 255))
-    
-        self.st7735.display(self.img)
-
-    def truncate_text(self, text, max_width):
-        while len(text) > 0 and self.draw.textlength(text, font=self.font_small) > max_width:
-            text = text[:-1]
+    def show(self, left_lines, right_lines):
+        # Replace both columns at once, e.g. for a periodic status screen
+        with self.lock:
+            self.left_lines = list(left_lines)[-self.max_lines:]
+            self.right_lines = list(right_lines)[-self.max_lines:]
+            self.update_display_left(refresh=False)
+            self.update_display_right(refresh=False)
+            self.refresh(force=True)
+
+    def update_display_left(self, refresh=True):
+        with self.lock:
+            self._draw_column("left", self.left_lines, 0, self.column_width, self.column_width)
+            if refresh:
+                self.refresh()
+
+    def update_display_right(self, refresh=True):
+        # Right column truncates with padding
+        with self.lock:
+            self._draw_column("right", self.right_lines, self.column_width, self.WIDTH, self.column_width - 4)
+            if refresh:
+                self.refresh()
+
+    def _draw_column(self, column, lines, x0, x1, max_width):
+        if self.drawn[column] == lines:
+            return
+        before = np.array(self.img)
+        self.draw.rectangle((x0, 0, x1, self.HEIGHT), fill=0)
+        for i, line in enumerate(lines):
+            truncated_line = self.truncate_text(line, max_width)
+            self.draw.text((x0 + 2, i * LINE_HEIGHT), truncated_line, font=self.font_small, fill=(255, 255, 255))
+        self.drawn[column] = list(lines)
+        # Only the pixels that actually changed go to the panel; descenders
+        # and overhangs past the column edge are caught too
+        changed = np.any(before != np.asarray(self.img), axis=2)
+        if changed.any():
+            ys = np.flatnonzero(changed.any(axis=1))
+            xs = np.flatnonzero(changed.any(axis=0))
+            self._mark_dirty(xs[0], ys[0], xs[-1] + 1, ys[-1] + 1)
+
+    def _mark_dirty(self, x0, y0, x1, y1):
+        # Merge with a region less than a line away: one window command beats a few spare pixels
+        gap = LINE_HEIGHT
+        for j, (a0, b0, a1, b1) in enumerate(self.dirty):
+            if x0 <= a1 + gap and a0 <= x1 + gap and y0 <= b1 + gap and b0 <= y1 + gap:
+                self.dirty[j] = (min(a0, x0), min(b0, y0), max(a1, x1), max(b1, y1))
+                return
+        self.dirty.append((x0, y0, x1, y1))
+
+    def refresh(self, force=False):
+        """Send dirty regions to the panel, at most MAX_FPS times a second unless forced.
+
+        A refresh that comes too soon is deferred, not dropped: a timer sends
+        everything drawn by then once the interval is up.
+        """
+        with self.lock:
+            if not self.dirty or not self.on:
+                return
+            now = time.monotonic()
+            wait = self.min_interval - (now - self.last_push)
+            if not force and wait > 0:
+                if self.flush_timer is None:
+                    self.flush_timer = threading.Timer(wait, self._deferred_refresh)
+                    self.flush_timer.daemon = True
+                    self.flush_timer.start()
+                return
+            for region in self.dirty:
+                self._push(*region)
+            self.dirty = []
+            self.last_push = now
+
+    def _deferred_refresh(self):
+        with self.lock:
+            self.flush_timer = None
+            self.refresh()
+
+    def _push(self, x0, y0, x1, y1):
+        # Rotate the region the way the driver does and write just that window
+        x1, y1 = min(x1, self.WIDTH), min(y1, self.HEIGHT)
+        k = self.rotation // 90
+        pb = np.rot90(np.asarray(self.img)[y0:y1, x0:x1], k).astype('uint16')
+        color = ((pb[:, :, 0] & 0xF8) << 8) | ((pb[:, :, 1] & 0xFC) << 3) | (pb[:, :, 2] >> 3)
+        data = np.dstack(((color >> 8) & 0xFF, color & 0xFF)).flatten().tolist()
+        # Region corners in panel (unrotated) coordinates
+        W, H = self.WIDTH, self.HEIGHT
+        if k == 0:
+            cols, rows = (x0, x1), (y0, y1)
+        elif k == 1:
+            cols, rows = (y0, y1), (W - x1, W - x0)
+        elif k == 2:
+            cols, rows = (W - x1, W - x0), (H - y1, H - y0)
+        else:
+            cols, rows = (H - y1, H - y0), (x0, x1)
+        self.st7735.set_window(cols[0], rows[0], cols[1] - 1, rows[1] - 1)
+        self.st7735.data(data)
+
+    def _widths(self, font):
+        if font not in self.glyph_widths:
+            self.glyph_widths[font] = {}
+        return self.glyph_widths[font]
+
+    def truncate_text(self, text, max_width, font=None):
+        # One pass over cached per-character advances instead of re-measuring each shorter prefix
+        font = font or self.font_small
+        widths = self._widths(font)
+        total = 0.0
+        for i, ch in enumerate(text):
+            w = widths.get(ch)
+            if w is None:
+                w = widths[ch] = font.getlength(ch)
+            total += w
+            if total > max_width:
+                return text[:i]
         return text
+
+class DisplayService:
+    """Owns a Display and renders it from a background thread.
+
+    Callers post() the whole screen as (left lines, right lines); that is one
+    attribute store into a latest-value slot, so a caller never waits on PIL
+    or SPI and an update that is overtaken before the next frame is simply
+    skipped. The thread renders at most `fps` times a second and watches
+    light(), a callable returning the light sensor's latest reading
+    (1=light, 0=dark, None=unknown): covering the sensor for `gesture_seconds`
+    and uncovering it toggles the display. Darkness lasting much longer than
+    that is nightfall, not a gesture, and is ignored. The display starts off
+    unless state_file records that the last gesture turned it on, so a
+    screen switched off stays off across the scheduled reboots.
+    """
+    def __init__(self, display, light=None, fps=MAX_FPS, gesture_seconds=GESTURE_SECONDS, start_on=False,
+                 state_file=None):
+        self.display = display
+        self.state_file = state_file
+        self.light = light
+        self.interval = 1.0 / fps
+        self.gesture_seconds = gesture_seconds
+        self.slot = None  # latest (left, right); written by callers, read by the thread
+        self.rendered = None
+        self.dark_since = None
+        self.want_on = start_on
+        if state_file is not None:
+            try:
+                with open(state_file) as f:
+                    self.want_on = f.read().strip() == "on"
+            except OSError:
+                pass  # no gesture recorded yet
+        self.errors = 0
+        self._stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._render_thread, daemon=True)
+        self.thread.start()
+
+    def post(self, left_lines, right_lines):
+        self.slot = (left_lines, right_lines)
+
+    def toggle(self):
+        self.want_on = not self.want_on
+        if self.state_file is not None:
+            try:
+                with open(self.state_file, "w") as f:
+                    f.write("on" if self.want_on else "off")
+            except OSError as e:
+                print(f"Display state not saved: {e}")
+
+    def _check_gesture(self, now):
+        value = self.light() if self.light is not None else None
+        if value is None:
+            return
+        if not value:
+            if self.dark_since is None:
+                self.dark_since = now
+        elif self.dark_since is not None:
+            dark = now - self.dark_since
+            self.dark_since = None
+            if self.gesture_seconds <= dark <= self.gesture_seconds * 3:
+                self.toggle()
+
+    def _render_thread(self):
+        """Thread: applies backlight changes and draws the newest posted screen."""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self._check_gesture(time.monotonic())
+                if self.want_on and not self.display.on:
+                    self.display.turn_on()
+                    self.rendered = None  # turn_on() blanks the panel
+                elif not self.want_on and self.display.on:
+                    self.display.turn_off()
+                slot = self.slot
+                if self.display.on and slot is not None and slot is not self.rendered:
+                    self.display.show(*slot)
+                    self.rendered = slot
+            except Exception as e:
+                self.errors += 1
+                if self.errors == 1:
+                    print(f"Display error: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.thread.join()
+        try:
+            self.display.turn_off()
+        except Exception as e:
+            print(f"Display error: {e}")
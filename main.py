@@ -1,15 +1,24 @@
-import numpy as np
+import asyncio
 import os
 import subprocess
-import time
-import pandas as pd
-from collections import defaultdict, OrderedDict
+from collections import defaultdict, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from model import Model
-from sound import Stream
-from sensors import SingleReadSensors
+from sensors import SingleReadSensors, RunningStats
+from detection import ActivityGate, SlidingWindowDetector, InferenceWorker
+from detection_log import DetectionLog
+from archive import DailyArchive
+from usb_sync import UsbSync
+from row_writer import RowWriter
+from ticker import Ticker
 import bioacoustics
 from datetime import datetime
 
+try:
+    from display import Display, DisplayService
+except ImportError:
+    Display = None  # no ST7735 / PIL: run headless
+
 # SET THIS TO YOUR SITE OR INIT FROM test-all-sensors.py
 gps_startup_loc = "42.2949,-83.7101"
 
@@ -18,9 +27,34 @@ DATA_FOLDER = "data"
 MOUNT_POINT = "/mnt/usb"
 USB_DEVICE = "/dev/sda1"
 CYCLE_MINUTES = 10
+ALIGN_CYCLES = True  # end cycles on wall-clock multiples of CYCLE_MINUTES (:00, :10, ...); see MIN_FIRST_CYCLE for the first one
+MIN_FIRST_CYCLE = 0.5  # fraction of a cycle; a shorter first aligned cycle runs on to the next boundary instead
 CYCLES_PER_WRITE = 1
 CYCLES_PER_SHUTDOWN = 6
 FILENAME_FMT = "%Y-%m-%d.csv"
+DETECTION_LOG_FMT = "detections_%Y-%m-%d.csv"  # long-format log of every window-level detection
+ARCHIVE_FOLDER = "archive"  # Parquet daily archive, inside DATA_FOLDER
+USB_SYNC_SECONDS = 60  # how often DATA_FOLDER is mirrored to the USB stick
+MODEL_WINDOW_SIZE = 144000  # CHANGE as needed for your model
+DETECTION_HOP_SECONDS = 3  # < 3 for overlapping windows, e.g. 1.5
+MAX_INFERENCE_RTF = 0.8  # overlap is reduced automatically above this real-time factor
+INFERENCE_QUEUE_SIZE = 8  # windows waiting for the inference worker
+INFERENCE_QUEUE_POLICY = "drop_oldest"  # or "drop_newest" / "degrade" (reduce overlap first)
+AUDIO_POLL_SECONDS = 1  # audio drained this often; must stay well under the Stream buffer length
+SENSOR_POLL_SECONDS = 1  # sensor snapshot (and temperature running average) cadence
+EVENT_POLL_SECONDS = 0.5  # detections collected from the inference worker this often
+DISPLAY_SECONDS = 1  # status posted to the display thread this often, if a display is attached
+DISPLAY_STATE_FILE = "display_state"  # last on/off gesture, kept across reboots (outside DATA_FOLDER, not synced)
+GATE_THRESHOLD_DB = 6.0  # skip inference on windows without 1-10 kHz activity; lower is more sensitive, None disables
+
+STATIC_HEADER = [
+    "timestamp", "gps",
+    "Temperature (C)", "Temperature (F)",
+    "Pressure (hPa)", "Pressure (inHg)", "Humidity (%)",
+    "Gas", "IAQ", "Light", "Motion Trips",
+    "ADI", "ACI", "AEI", "BI", "NDSI",
+    "Total Species", "Total Detections", "Temp Running Avg (C)"
+]
 
 def calculate_iaq(gas, humidity, temperature):
     try:
@@ -46,168 +80,315 @@ def ensure_usb_mounted(mount_point=MOUNT_POINT, device=USB_DEVICE):
         os.makedirs(mount_point, exist_ok=True)
         subprocess.run(["sudo", "mount", device, mount_point, "-o", "uid=1000,gid=1000"], check=True)
 
-def safe_local_append(df, filename, header):
-    try:
-        os.makedirs(DATA_FOLDER, exist_ok=True)
-        local_file_path = f"{DATA_FOLDER}/{filename}"
-        file_exists = os.path.exists(local_file_path)
-        df.to_csv(local_file_path, mode='a', header=header and not file_exists, index=False)
-        print(f"Appended locally to {local_file_path}")
-    except Exception as e:
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        fallback_filename = f"{DATA_FOLDER}/{filename.split('.')[0]}_{timestamp}.csv"
-        df.to_csv(fallback_filename, index=False)
-        print(f"Write error for {filename}: {e}. Data saved to {fallback_filename} instead.")
-
-def safe_usb_append(df, filename, header):
-    try:
-        ensure_usb_mounted()
-        usb_file_path = f"{MOUNT_POINT}/{filename}"
-        file_exists = os.path.exists(usb_file_path)
-        df.to_csv(usb_file_path, mode='a', header=header and not file_exists, index=False)
-        print(f"Appended {len(df)} row(s) to USB: {usb_file_path}")
-    except Exception as e:
-        print(f"USB append error: {e}. Will retry next cycle.")
-
 def print_status_bar(minute_idx, cycle_idx, total_minutes, total_cycles):
     print(f"[{datetime.now()}] Cycle {cycle_idx+1}/{total_cycles}, Minute {minute_idx+1}/{total_minutes}", end='\r', flush=True)
 
-def process_sensor_data(sensors, sensor_sums, sensor_counts, errors, motion_trips):
+def process_sensor_data(sensors, errors, motion_trips):
+    # Averages come from sensors.stats(); only motion is tallied here
     try:
         sensor_data = sensors.get()
-        for key, value in sensor_data.items():
-            if value is not None:
-                if key == "motion_tripped":
-                    if value:
-                        motion_trips[0] += 1
-                elif key in {"temp", "humidity", "pressure", "gas", "light"}:
-                    sensor_sums[key] += value
-                    sensor_counts[key] += 1
+        if sensor_data.get("motion_tripped"):
+            motion_trips[0] += int(sensor_data["motion_tripped"])  # trips since the previous get()
     except Exception as e:
         errors.append(f"Sensor reading error: {e}")
 
-def analyze_audio_data(audio_chunks, stream_sr, errors):
+def stat_mean(sensor_stats, key):
+    st = sensor_stats.get(key)
+    return st.mean if st is not None and st.count else None
+
+def analyze_audio_data(bio_acc, errors):
     bioacoustic_indices = {"ADI": 0, "ACI": 0, "AEI": 0, "BI": 0, "NDSI": 0}
-    if audio_chunks:
+    if bio_acc.samples:
         try:
-            full_audio_data = np.concatenate(audio_chunks)
-            bioacoustic_indices = bioacoustics.bioacoustic_analysis(full_audio_data, stream_sr)
+            bioacoustic_indices = bio_acc.result()
         except Exception as e:
             errors.append(f"Bioacoustic analysis error: {e}")
     return bioacoustic_indices
 
+def build_cycle_row(species_counts, all_birds, sensor_stats, temp_running,
+                    motion_trips, bioacoustic_indices, timestamp=None):
+    # After cycle: sensor summaries from the per-channel running statistics
+    temp_c = stat_mean(sensor_stats, "temp")
+    temp_f = round(temp_c * 9 / 5 + 32, 2) if temp_c is not None else None
+    temperature_running_avg = round(temp_running.mean, 2) if temp_running is not None and temp_running.count else None
+    pressure = stat_mean(sensor_stats, "pressure")
+    pressure_inhg = round(pressure * 0.02953, 2) if pressure is not None else None
+    humidity = stat_mean(sensor_stats, "humidity")
+    gas = stat_mean(sensor_stats, "gas")
+    iaq = calculate_iaq(gas, humidity, temperature_running_avg)
+    light = stat_mean(sensor_stats, "light")
+    light = int(light > 0) if light is not None else 0
+
+    # Build consistent row
+    row = OrderedDict()
+    row["timestamp"] = (timestamp or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    row["gps"] = gps_startup_loc
+    row["Temperature (C)"] = round(temp_c,2) if temp_c is not None else None
+    row["Temperature (F)"] = temp_f
+    row["Pressure (hPa)"] = round(pressure,2) if pressure is not None else None
+    row["Pressure (inHg)"] = pressure_inhg
+    row["Humidity (%)"] = round(humidity,2) if humidity is not None else None
+    row["Gas"] = round(gas,2) if gas is not None else None
+    row["IAQ"] = iaq
+    row["Light"] = light
+    row["Motion Trips"] = motion_trips[0]
+    row["ADI"] = round(bioacoustic_indices.get("ADI",0),2)
+    row["ACI"] = round(bioacoustic_indices.get("ACI",0),2)
+    row["AEI"] = round(bioacoustic_indices.get("AEI",0),2)
+    row["BI"] = round(bioacoustic_indices.get("BI",0),2)
+    row["NDSI"] = round(bioacoustic_indices.get("NDSI",0),2)
+    row["Total Species"] = len([k for k,v in species_counts.items() if v > 0])
+    row["Total Detections"] = sum(species_counts.values())
+    row["Temp Running Avg (C)"] = temperature_running_avg
+    for bird in all_birds:
+        row[bird] = species_counts.get(bird, 0)
+    return row
+
+def write_batch(writer, batch_rows, all_birds, filename, archive=None):
+    # Fill missing bird columns for all batch rows
+    for r in batch_rows:
+        for bird in all_birds:
+            if bird not in r: r[bird] = 0
+    writer.write(filename, batch_rows)
+    if archive is not None:
+        archive.append(batch_rows, STATIC_HEADER)
+
+def make_detector(model, sr, log=None):
+    model_hop_size = int(DETECTION_HOP_SECONDS * sr)
+    gate = ActivityGate(sr, GATE_THRESHOLD_DB) if GATE_THRESHOLD_DB is not None else None
+    return SlidingWindowDetector(model, sr, MODEL_WINDOW_SIZE, model_hop_size,
+                                 min_p=0.10, max_batch=model.tuning.get("batch_size", 4),
+                                 max_rtf=MAX_INFERENCE_RTF, gate=gate, log=log)
+
+def new_cycle_state(sr):
+    # Running tallies for one cycle; tasks always look up the current one in rt["cycle"]
+    return {
+        "species_counts": defaultdict(int),
+        "motion_trips": [0],
+        "errors": [],
+        "temp_running": RunningStats(),  # mean of the cycle-to-date temperature, polled each second
+        "bio_acc": bioacoustics.BioacousticAccumulator(sr),
+        "started": False,  # set once the cycle's first audio reaches the inference worker
+    }
+
+def process_audio(stream, worker, cycle, cursor):
+    # Runs on the audio executor: drain new samples, update indices, queue windows
+    audio_chunk, cursor, lost = stream.read_since(cursor)
+    if not cycle["started"]:
+        # Detection-log offsets and the queue-depth peak restart with the cycle's own audio
+        worker.start_cycle()
+        cycle["started"] = True
+    if lost:
+        cycle["errors"].append(f"Audio overrun: {lost} samples lost")
+        worker.skip(lost)
+    if len(audio_chunk):
+        # Silent chunks go in too, so window offsets stay in step with the cursor
+        cycle["bio_acc"].update(audio_chunk)
+        # Queue every full window the new audio completes
+        try:
+            worker.submit(audio_chunk)
+        except Exception as e:
+            cycle["errors"].append(f"Audio processing error: {e}")
+    return cursor
+
+def collect_events(rt, worker):
+    cycle = rt["cycle"]
+    for label, prob in worker.get_events():
+        cycle["species_counts"][label] += 1
+        rt["known_birds"].add(label)
+        rt["recent"].append((label, prob))
+    cycle["errors"].extend(worker.get_errors())
+
+def cycle_stats(worker, previous):
+    # Worker counters run across cycles; report this cycle's share (max_queue_depth is per cycle already)
+    stats = worker.stats()
+    for key in ("submitted", "inferred", "dropped", "degraded", "gated"):
+        stats[key], previous[key] = stats[key] - previous.get(key, 0), stats[key]
+    return stats
+
+def status_lines(rt):
+    left = [f"Cycle {rt['cycle_idx']+1}/{rt['cycles']}",
+            f"{sum(rt['cycle']['species_counts'].values())} calls"]
+    for key, fmt in (("temp", "{:.1f} C"), ("humidity", "{:.0f} %"), ("pressure", "{:.0f} hPa")):
+        value = stat_mean(rt["cycle_sensors"], key)
+        if value is not None:
+            left.append(fmt.format(value))
+    right = [f"{prob:.0%} {label}" for label, prob in reversed(rt["recent"])]
+    return left, right
+
+def wall_now(clock=None):
+    return datetime.fromtimestamp(clock.time()) if clock is not None else datetime.now()
+
+async def every(ticker, fn, *args):
+    # Calls fn on the ticker's grid until cancelled; work time doesn't add to the period
+    while True:
+        fn(*args)
+        await ticker.wait_async()
+
+async def audio_task(rt, stream, worker, audio_pool):
+    loop = asyncio.get_running_loop()
+    cursor = stream.total  # start from now, not from whatever the buffer held at boot
+    while True:
+        cursor = await loop.run_in_executor(audio_pool, process_audio, stream, worker, rt["cycle"], cursor)
+        await rt["tickers"]["audio"].wait_async()
+
+def sample_sensors(rt, sensors):
+    cycle = rt["cycle"]
+    process_sensor_data(sensors, cycle["errors"], cycle["motion_trips"])
+    rt["cycle_sensors"] = sensors.stats()
+    cycle["temp_running"].update(stat_mean(rt["cycle_sensors"], "temp"))
+
+def post_status(rt, display_service):
+    # Rendering and SPI happen on the service's own thread
+    display_service.post(*status_lines(rt))
+
+async def writer_task(rows, row_writer, archive, detection_log, usb_sync, io_pool, clock=None):
+    # Writes cycle rows in batches of CYCLES_PER_WRITE; None flushes what is left and ends
+    loop = asyncio.get_running_loop()
+    filename = wall_now(clock).strftime(FILENAME_FMT)
+    batch_rows = []
+    while True:
+        item = await rows.get()
+        if item is not None:
+            batch_rows.append(item[0])
+            all_birds = item[1]
+        if batch_rows and (item is None or len(batch_rows) >= CYCLES_PER_WRITE):
+            # Write batch with consistent columns
+            await loop.run_in_executor(io_pool, write_batch, row_writer, batch_rows, all_birds, filename, archive)
+            usb_sync.notify()
+            batch_rows = []
+        await loop.run_in_executor(io_pool, detection_log.flush)
+        if item is None:
+            return
+
+async def cycle_task(rt, sensors, stream, worker, detector, usb_sync, rows, audio_pool, clock=None):
+    loop = asyncio.get_running_loop()
+    previous = {}
+    cycle_ticker = Ticker(rt["cycle_seconds"], align=rt["align"], tolerance=1.0, clock=clock,
+                          min_first=rt["cycle_seconds"] * MIN_FIRST_CYCLE)
+    for cycle_idx in range(rt["cycles"]):
+        rt["cycle_idx"] = cycle_idx
+        print(f"\n=== Begin Cycle {cycle_idx+1}/{rt['cycles']} at {wall_now(clock)}, "
+              f"ends in {cycle_ticker.delay():.0f} s ===")
+        # Scheduled end of the cycle, so rows from different units share timestamps
+        cycle_end = await cycle_ticker.wait_async()
+
+        # Let queued windows finish so their calls count towards this cycle
+        if not await loop.run_in_executor(None, worker.wait_idle, 30):
+            rt["cycle"]["errors"].append("Inference worker still busy at cycle end")
+        # No await between the last collect and the swap, so no call is counted twice or lost
+        collect_events(rt, worker)
+        cycle = rt["cycle"]
+        rt["cycle"] = new_cycle_state(stream.sr)
+        sensor_stats = sensors.stats(reset=True)
+        # Before the audio executor sees the new cycle and restarts the queue-depth peak
+        stats = cycle_stats(worker, previous)
+        # Queued behind any pending update of this cycle's accumulator
+        bioacoustic_indices = await loop.run_in_executor(audio_pool, analyze_audio_data, cycle["bio_acc"], cycle["errors"])
+
+        # Dynamically build full header with all ever-seen birds
+        all_birds = sorted(rt["known_birds"])
+        row = build_cycle_row(cycle["species_counts"], all_birds, sensor_stats, cycle["temp_running"],
+                              cycle["motion_trips"], bioacoustic_indices,
+                              timestamp=datetime.fromtimestamp(cycle_end))
+
+        print("\nCycle summary:", row)
+        for e in cycle["errors"]:
+            print(e)
+        print(f"Detection: {stats['inferred']}/{stats['submitted']} windows inferred, {stats['gated']} gated, {stats['dropped']} dropped, "
+              f"max queue {stats['max_queue_depth']}, RTF {stats['rtf']:.2f}, hop {detector.hop / stream.sr:.2f}s")
+        sync = usb_sync.stats()
+        print(f"USB sync: {sync['bytes_behind']} bytes / {sync['seconds_behind']:.0f} s behind, "
+              f"{sync['failures']} failures" + (f" (last: {sync['last_error']})" if sync['last_error'] else ""))
+        print("Timing: cycle " + cycle_ticker.format_stats() + "".join(
+            f"; {name} " + ticker.format_stats() for name, ticker in rt["tickers"].items()))
+        for ticker in rt["tickers"].values():
+            ticker.reset_stats()
+        await rows.put((row, all_birds))
+    await rows.put(None)
+
+async def run(stream, sensors, worker, detector, detection_log, archive, row_writer, usb_sync, display_service=None,
+              clock=None, cycles=None, cycle_minutes=None, align=None, audio_poll_seconds=None):
+    """Runs every subsystem as its own task until `cycles` cycles are written.
+
+    Audio draining, sensor sampling, detection collection, cycle rollover,
+    display updates and file writing each keep their own cadence; blocking
+    work goes to single-thread executors (the display renders on its own
+    thread) so a slow write never holds up the audio executor. clock (see
+    Ticker) replaces the time module for every ticker, e.g. in replay.py.
+    cycles, cycle_minutes, align and audio_poll_seconds default to
+    CYCLES_PER_SHUTDOWN, CYCLE_MINUTES, ALIGN_CYCLES and AUDIO_POLL_SECONDS.
+    """
+    rt = {"cycle": new_cycle_state(stream.sr), "cycle_idx": 0, "cycle_sensors": {},
+          "known_birds": set(), "recent": deque(maxlen=display_service.display.max_lines if display_service else 8),
+          "cycles": CYCLES_PER_SHUTDOWN if cycles is None else cycles,
+          "cycle_seconds": int((CYCLE_MINUTES if cycle_minutes is None else cycle_minutes) * 60),
+          "align": ALIGN_CYCLES if align is None else align,
+          "tickers": {"audio": Ticker(AUDIO_POLL_SECONDS if audio_poll_seconds is None else audio_poll_seconds,
+                                      clock=clock), "sensors": Ticker(SENSOR_POLL_SECONDS, clock=clock),
+                      "events": Ticker(EVENT_POLL_SECONDS, clock=clock)}}
+    if display_service is not None:
+        rt["tickers"]["display"] = Ticker(DISPLAY_SECONDS, tolerance=1.0, clock=clock)
+    rows = asyncio.Queue()
+    audio_pool = ThreadPoolExecutor(1, thread_name_prefix="audio")
+    io_pool = ThreadPoolExecutor(1, thread_name_prefix="io")
+    sensors.reset_stats()
+    background = [
+        asyncio.create_task(audio_task(rt, stream, worker, audio_pool)),
+        asyncio.create_task(every(rt["tickers"]["sensors"], sample_sensors, rt, sensors)),
+        asyncio.create_task(every(rt["tickers"]["events"], collect_events, rt, worker)),
+    ]
+    if display_service is not None:
+        background.append(asyncio.create_task(every(rt["tickers"]["display"], post_status, rt, display_service)))
+    cycles = asyncio.create_task(cycle_task(rt, sensors, stream, worker, detector, usb_sync, rows, audio_pool, clock))
+    writer = asyncio.create_task(writer_task(rows, row_writer, archive, detection_log, usb_sync, io_pool, clock))
+    try:
+        # Runs until the writer has flushed the last cycle; a failing task ends the run early
+        pending = set(background + [cycles, writer])
+        while not writer.done():
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+    finally:
+        for task in background + [cycles, writer]:
+            task.cancel()
+        await asyncio.gather(*background, cycles, writer, return_exceptions=True)
+        for pool in (audio_pool, io_pool):
+            pool.shutdown(wait=True)
+
 def main():
+    # Imported here so the helpers above can be used without an audio device (see replay.py)
+    from sound import Stream
     os.makedirs(DATA_FOLDER, exist_ok=True)
     model = Model("model_int8")
     stream = Stream(device=AUDIO_DEVICE_INDEX)
     sensors = SingleReadSensors()
     stream.start()
+    worker = None
+    display_service = None
+    if Display is not None:
+        try:
+            # Hand over the light sensor toggles the screen (see README)
+            display_service = DisplayService(Display(), light=lambda: sensors.latest("light"),
+                                             state_file=DISPLAY_STATE_FILE)
+        except Exception as e:
+            print(f"Display unavailable: {e}")
+    detection_log = DetectionLog(DATA_FOLDER, model.CLASSES, DETECTION_LOG_FMT)
+    archive = DailyArchive(os.path.join(DATA_FOLDER, ARCHIVE_FOLDER))
+    row_writer = RowWriter(DATA_FOLDER, STATIC_HEADER)
+    # Copies new data to the stick in the background instead of appending inline
+    usb_sync = UsbSync(DATA_FOLDER, MOUNT_POINT, mount=ensure_usb_mounted, interval=USB_SYNC_SECONDS)
     try:
-        known_birds = set()
-        filename = datetime.now().strftime(FILENAME_FMT)
-        static_header = [
-            "timestamp", "gps",
-            "Temperature (C)", "Temperature (F)",
-            "Pressure (hPa)", "Pressure (inHg)", "Humidity (%)",
-            "Gas", "IAQ", "Light", "Motion Trips",
-            "ADI", "ACI", "AEI", "BI", "NDSI",
-            "Total Species", "Total Detections", "Temp Running Avg (C)"
-        ]
-        cycles_since_write = 0
-        batch_rows = []
-        model_window_size = 144000  # CHANGE as needed for your model
-
-        for cycle_idx in range(CYCLES_PER_SHUTDOWN):
-            print(f"\n=== Begin Cycle {cycle_idx+1}/{CYCLES_PER_SHUTDOWN} at {datetime.now()} ===")
-            # Running tallies
-            species_counts = defaultdict(int)
-            motion_trips = [0]
-            errors = []
-            temperatures = []
-            accum_sensor_sums = defaultdict(float)
-            accum_sensor_counts = defaultdict(int)
-            bio_chunks = []
-            running_audio_buffer = np.array([], dtype='float32')
-            minute_seconds = int(CYCLE_MINUTES * 60)
-            cycle_start = time.time()
-            while time.time() - cycle_start < minute_seconds:
-                audio_chunk = stream.get_audio()
-                if audio_chunk is not None and np.any(audio_chunk):
-                    running_audio_buffer = np.concatenate([running_audio_buffer, audio_chunk])
-                    bio_chunks.append(audio_chunk)
-                    # Process all full windows in buffer (non-overlapping)
-                    while len(running_audio_buffer) >= model_window_size:
-                        model_window = running_audio_buffer[:model_window_size]
-                        running_audio_buffer = running_audio_buffer[model_window_size:]
-                        try:
-                            labels = model.predict_threshold([model_window], min_p=0.10)
-                            for label, prob in labels:
-                                species_counts[label] += 1
-                                known_birds.add(label)
-                        except Exception as e:
-                            errors.append(f"Audio processing error: {e}")
-                process_sensor_data(sensors, accum_sensor_sums, accum_sensor_counts, errors, motion_trips)
-                if "temp" in accum_sensor_sums and accum_sensor_counts["temp"] > 0:
-                    temperatures.append(accum_sensor_sums["temp"] / accum_sensor_counts["temp"])
-                time.sleep(1)
-
-            # After cycle: sensor summaries
-            temp_c = accum_sensor_sums["temp"] / accum_sensor_counts["temp"] if accum_sensor_counts["temp"] > 0 else None
-            temp_f = round(temp_c * 9 / 5 + 32, 2) if temp_c is not None else None
-            temperature_running_avg = round(np.mean(temperatures), 2) if temperatures else None
-            pressure = accum_sensor_sums["pressure"] / accum_sensor_counts["pressure"] if accum_sensor_counts["pressure"] > 0 else None
-            pressure_inhg = round(pressure * 0.02953, 2) if pressure is not None else None
-            humidity = accum_sensor_sums["humidity"] / accum_sensor_counts["humidity"] if accum_sensor_counts["humidity"] > 0 else None
-            gas = accum_sensor_sums["gas"] / accum_sensor_counts["gas"] if accum_sensor_counts["gas"] > 0 else None
-            iaq = calculate_iaq(gas, humidity, temperature_running_avg)
-            light = int((accum_sensor_sums["light"] / accum_sensor_counts["light"]) > 0) if accum_sensor_counts["light"] > 0 else 0
-            gps = gps_startup_loc
-            bioacoustic_indices = analyze_audio_data(bio_chunks, stream.sr, errors)
-
-            # Dynamically build full header with all ever-seen birds
-            all_birds = sorted(known_birds)
-            header = static_header + all_birds
-
-            # Build consistent row
-            row = OrderedDict()
-            row["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            row["gps"] = gps
-            row["Temperature (C)"] = round(temp_c,2) if temp_c is not None else None
-            row["Temperature (F)"] = temp_f
-            row["Pressure (hPa)"] = round(pressure,2) if pressure is not None else None
-            row["Pressure (inHg)"] = pressure_inhg
-            row["Humidity (%)"] = round(humidity,2) if humidity is not None else None
-            row["Gas"] = round(gas,2) if gas is not None else None
-            row["IAQ"] = iaq
-            row["Light"] = light
-            row["Motion Trips"] = motion_trips[0]
-            row["ADI"] = round(bioacoustic_indices.get("ADI",0),2)
-            row["ACI"] = round(bioacoustic_indices.get("ACI",0),2)
-            row["AEI"] = round(bioacoustic_indices.get("AEI",0),2)
-            row["BI"] = round(bioacoustic_indices.get("BI",0),2)
-            row["NDSI"] = round(bioacoustic_indices.get("NDSI",0),2)
-            row["Total Species"] = len([k for k,v in species_counts.items() if v > 0])
-            row["Total Detections"] = sum(species_counts.values())
-            row["Temp Running Avg (C)"] = temperature_running_avg
-            for bird in all_birds:
-                row[bird] = species_counts.get(bird, 0)
-
-            print("\nCycle summary:", row)
-            batch_rows.append(row)
-            cycles_since_write += 1
-
-            # Write batch with consistent columns
-            if cycles_since_write >= CYCLES_PER_WRITE or (cycle_idx+1) == CYCLES_PER_SHUTDOWN:
-                # Fill missing bird columns for all batch rows
-                for r in batch_rows:
-                    for bird in all_birds:
-                        if bird not in r: r[bird] = 0
-                df = pd.DataFrame(batch_rows, columns=header)
-                safe_local_append(df, filename, header=True)
-                safe_usb_append(df, filename, header=True)
-                batch_rows = []
-                cycles_since_write = 0
+        detector = make_detector(model, stream.sr, log=detection_log)
+        # Inference runs on its own thread so slow windows don't stretch the sampling loop
+        worker = InferenceWorker(detector, max_queue=INFERENCE_QUEUE_SIZE, policy=INFERENCE_QUEUE_POLICY)
+        worker.reset()
+        asyncio.run(run(stream, sensors, worker, detector, detection_log, archive, row_writer, usb_sync, display_service))
 
+        # Final copy to the stick before power goes
+        detection_log.flush()
+        row_writer.close()
+        usb_sync.stop()
         print(f"\nCompleted {CYCLES_PER_SHUTDOWN} cycles. Shutting down Pi.")
         subprocess.run(["sudo", "shutdown", "-h", "now"])
 
@@ -216,6 +397,13 @@ def main():
     except Exception as exc:
         print(f"\nERROR in main loop: {exc}")
     finally:
+        if worker is not None:
+            worker.stop()
+        detection_log.close()
+        row_writer.close()
+        usb_sync.stop()
+        if display_service is not None:
+            display_service.stop()
         stream.stop()
         print("Audio stream stopped.")
 
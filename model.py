@@ -1,10 +1,21 @@
+import hashlib
+import json
 import numpy as np
 import operator
 import os
+import time
 import tflite_runtime.interpreter as tflite
 
 userDir = os.path.expanduser('~')
 labels_file = "labels"
+labels_cache_file = "labels_cache.npz"
+tuning_file = "model_tuning.json"  # written by tune.py
+
+# Delegate options: "default" lets the runtime apply its built-in delegates
+# (XNNPACK when the wheel was built with it), "none" disables them, anything
+# else is treated as the path of an external delegate library.
+DEFAULT_DELEGATE = "default"
+NO_DELEGATE = "none"
 
 pantanal_birds = {
     "Alder Flycatcher",
@@ -232,29 +243,118 @@ pantanal_birds = {
     "Yellowish Pipit",
 }
 
+def load_labels(labelspath, cachepath):
+    """Return (classes, allowed_indices) for a labels file, using a binary cache.
+
+    The cache is keyed by a hash of the labels file and the Pantanal species
+    list, so editing either one rebuilds it.
+    """
+    with open(labelspath, 'rb') as lfile:
+        raw = lfile.read()
+    digest = hashlib.sha1(raw)
+    digest.update("\n".join(sorted(pantanal_birds)).encode('utf8'))
+    key = digest.hexdigest()
+
+    try:
+        with np.load(cachepath) as cache:
+            if str(cache['key']) == key:
+                return cache['classes'].tolist(), cache['allowed'].astype(np.intp)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    classes = [line.strip().split('_', 1)[1] for line in raw.decode('utf8').splitlines() if line.strip()]
+    allowed = np.array([i for i, label in enumerate(classes) if label in pantanal_birds], dtype=np.intp)
+    try:
+        np.savez(cachepath, key=np.array(key), classes=np.array(classes), allowed=allowed.astype(np.int32))
+    except OSError as e:
+        print(f"Could not write labels cache: {e}")
+    return classes, allowed
+
+def load_tuning(model, path=None):
+    # Tuned settings for this model on this machine, or {} if tune.py hasn't run
+    path = path or os.path.join(os.path.dirname(os.path.abspath(__file__)), tuning_file)
+    try:
+        with open(path) as f:
+            return json.load(f).get(model, {})
+    except (OSError, ValueError):
+        return {}
+
+def make_interpreter(model_path, threads, delegate=DEFAULT_DELEGATE):
+    if delegate == DEFAULT_DELEGATE:
+        return tflite.Interpreter(model_path=model_path, num_threads=threads)
+    if delegate == NO_DELEGATE:
+        resolver = getattr(tflite, "OpResolverType", None)
+        if resolver is None:
+            raise ValueError("This tflite_runtime cannot disable its default delegates")
+        return tflite.Interpreter(model_path=model_path, num_threads=threads,
+                                  experimental_op_resolver_type=resolver.BUILTIN_WITHOUT_DEFAULT_DELEGATES)
+    return tflite.Interpreter(model_path=model_path, num_threads=threads,
+                              experimental_delegates=[tflite.load_delegate(delegate)])
+
 class Model:
-    def __init__(self, model, threads=2):
+    def __init__(self, model, threads=None, warmup=True, delegate=None):
+        t_start = time.perf_counter()
+        self.timings = {}
         base_dir = os.path.dirname(os.path.abspath(__file__))
         self.model_path = os.path.join(base_dir, model + ".tflite")
         print(f'Model path: {self.model_path}')
 
-        self.myinterpreter = tflite.Interpreter(model_path=self.model_path, num_threads=threads)
+        # Explicit arguments win, then tune.py's results, then the old defaults
+        self.tuning = load_tuning(model)
+        self.threads = threads or self.tuning.get("threads", 2)
+        self.delegate = delegate or self.tuning.get("delegate", DEFAULT_DELEGATE)
+        try:
+            self.myinterpreter = make_interpreter(self.model_path, self.threads, self.delegate)
+        except (ValueError, RuntimeError, OSError) as e:
+            if delegate is not None or self.delegate == DEFAULT_DELEGATE:
+                raise
+            # A tuned delegate that no longer loads shouldn't stop the unit
+            print(f"Delegate {self.delegate} unavailable ({e}), using default")
+            self.delegate = DEFAULT_DELEGATE
+            self.myinterpreter = make_interpreter(self.model_path, self.threads)
         self.myinterpreter.allocate_tensors()
         input_details = self.myinterpreter.get_input_details()
         output_details = self.myinterpreter.get_output_details()
         self.INPUT_LAYER_INDEX = input_details[0]['index']
         self.INPUT_SHAPE = input_details[0]['shape']
         self.OUTPUT_LAYER_INDEX = output_details[0]['index']
+        self.batch_size = self.INPUT_SHAPE[0]
+        self.timings["load"] = time.perf_counter() - t_start
 
-        # Load labels
-        self.CLASSES = []
+        # Load labels and the indices of the Pantanal classes, compiled once so
+        # filtering is a single NumPy take
+        t0 = time.perf_counter()
         labelspath = os.path.join(base_dir, labels_file + ".txt")
-        with open(labelspath, 'r') as lfile:
-            for line in lfile:
-                _, common_name = line.strip().split('_', 1)
-                self.CLASSES.append(common_name)
+        self.CLASSES, self.ALLOWED_INDICES = load_labels(labelspath, os.path.join(base_dir, labels_cache_file))
+        self.ALLOWED_LABELS = [self.CLASSES[i] for i in self.ALLOWED_INDICES]
+        self.timings["labels"] = time.perf_counter() - t0
+
+        self.first_invoke_done = False
+        if warmup:
+            self.warmup()
 
-        print('Model loaded successfully.')
+        print('Model loaded successfully.', self.format_timings())
+
+    def warmup(self):
+        # A dummy invoke so the first real window doesn't pay for lazy init
+        t0 = time.perf_counter()
+        self.set_batch_size(self.INPUT_SHAPE[0])
+        self.myinterpreter.set_tensor(self.INPUT_LAYER_INDEX, np.zeros(self.INPUT_SHAPE, dtype='float32'))
+        self.myinterpreter.invoke()
+        self.timings["warmup"] = time.perf_counter() - t0
+
+    def invoke(self):
+        if self.first_invoke_done:
+            self.myinterpreter.invoke()
+            return
+        t0 = time.perf_counter()
+        self.myinterpreter.invoke()
+        self.timings["first_invoke"] = time.perf_counter() - t0
+        self.first_invoke_done = True
+        print('First inference:', self.format_timings())
+
+    def format_timings(self):
+        return ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in self.timings.items())
 
     def custom_sigmoid(self, x, sensitivity=1.0):
         return 1.0 / (1.0 + np.exp(-sensitivity * x))
@@ -263,23 +363,52 @@ class Model:
         # Ensure the sample matches the expected input shape of the model
         return np.array(sample, dtype='float32').reshape(self.INPUT_SHAPE)
 
-    def predict(self, sample, sensitivity=1.0, threshold=0.1):
+    def set_batch_size(self, n):
+        # Resizing re-allocates every tensor, so only do it when the size changes
+        if n != self.batch_size:
+            self.myinterpreter.resize_tensor_input(self.INPUT_LAYER_INDEX, [n, *self.INPUT_SHAPE[1:]])
+            self.myinterpreter.allocate_tensors()
+            self.batch_size = n
+
+    def logit_threshold(self, threshold, sensitivity=1.0):
+        # sigmoid(sensitivity * x) > threshold  <=>  x > logit(threshold) / sensitivity
+        if threshold <= 0:
+            return -np.inf
+        if threshold >= 1:
+            return np.inf
+        return np.log(threshold / (1.0 - threshold)) / sensitivity
+
+    def detections_from_logits(self, logits, sensitivity=1.0, threshold=0.1):
+        """Return [(label, prob)] per row of logits for Pantanal classes above threshold.
+
+        Only the classes that pass the threshold are converted to probabilities.
+        """
+        logits = np.atleast_2d(logits)
+        allowed = logits[:, self.ALLOWED_INDICES]
+        rows, cols = np.nonzero(allowed > self.logit_threshold(threshold, sensitivity))
+        probs = self.custom_sigmoid(allowed[rows, cols], sensitivity)
+        detections = [[] for _ in range(len(logits))]
+        for row, col, prob in zip(rows, cols, probs):
+            detections[row].append((self.ALLOWED_LABELS[col], prob))
+        return [sorted(d, key=operator.itemgetter(1), reverse=True) for d in detections]
+
+    def predict(self, sample, sensitivity=1.0, threshold=0.1, verbose=False):
         try:
             processed_sample = self.preprocess_sample(sample)
+            self.set_batch_size(self.INPUT_SHAPE[0])
             self.myinterpreter.set_tensor(self.INPUT_LAYER_INDEX, processed_sample)
-            self.myinterpreter.invoke()
-            prediction = self.myinterpreter.get_tensor(self.OUTPUT_LAYER_INDEX)[0].copy()
+            self.invoke()
+            prediction = self.myinterpreter.get_tensor(self.OUTPUT_LAYER_INDEX)[0]
 
-            p_sigmoid = self.custom_sigmoid(prediction, sensitivity)
-            detected_birds = [(label, prob) for label, prob in zip(self.CLASSES, p_sigmoid)
-                              if label in pantanal_birds and prob > threshold]
+            detected_birds = self.detections_from_logits(prediction, sensitivity, threshold)[0]
 
-            if not detected_birds:
-                print("No Pantanal birds detected with probability > threshold.")
-            else:
-                print("Detected Pantanal birds:", [(label, round(prob, 3)) for label, prob in detected_birds])
+            if verbose:
+                if not detected_birds:
+                    print("No Pantanal birds detected with probability > threshold.")
+                else:
+                    print("Detected Pantanal birds:", [(label, round(prob, 3)) for label, prob in detected_birds])
 
-            return sorted(detected_birds, key=operator.itemgetter(1), reverse=True)
+            return detected_birds
         except Exception as e:
             print(f"Error during prediction: {e}")
             return []
@@ -287,6 +416,25 @@ class Model:
     def predict_threshold(self, sample, sensitivity=1.0, min_p=0.1, timestamp=0):
         return [p for p in self.predict(sample, sensitivity, threshold=min_p) if p[1] >= min_p]
 
+    def predict_batch(self, windows, sensitivity=1.0, min_p=0.1, return_scores=True):
+        """Run N windows through one invoke.
+
+        Returns an (N, classes) array of sigmoid scores (None if return_scores
+        is False) and, per window, the Pantanal detections with probability
+        >= min_p sorted high to low.
+        """
+        batch = np.asarray(windows, dtype='float32').reshape(len(windows), -1)
+        if batch.shape[1] != self.INPUT_SHAPE[1]:
+            raise ValueError(f"Expected windows of {self.INPUT_SHAPE[1]} samples, got {batch.shape[1]}")
+        self.set_batch_size(len(batch))
+        self.myinterpreter.set_tensor(self.INPUT_LAYER_INDEX, batch)
+        self.invoke()
+        logits = self.myinterpreter.get_tensor(self.OUTPUT_LAYER_INDEX)
+
+        detections = self.detections_from_logits(logits, sensitivity, min_p)
+        scores = self.custom_sigmoid(logits, sensitivity) if return_scores else None
+        return scores, detections
+
 # Example Usage
 if __name__ == "__main__":
     model_path = "model_int8"  # Update with your actual model file name minus '.tflite'
@@ -294,5 +442,5 @@ if __name__ == "__main__":
 
     # Example input; ensure this matches the expected model input shape
     example_sample = np.random.rand(*model.INPUT_SHAPE).astype(np.float32)  # Adjust based on actual input data format
-    results = model.predict(example_sample)
+    results = model.predict(example_sample, verbose=True)
     print("Results:", results)
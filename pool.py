@@ -0,0 +1,199 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+from collections import deque
+import numpy as np
+from multiprocessing import shared_memory
+
+def _pool_worker(model_name, threads, shm_name, shape, tasks, results):
+    shm = slots = None
+    try:
+        # Imported here so the parent process never builds an interpreter
+        from model import Model
+        shm = shared_memory.SharedMemory(name=shm_name)
+        slots = np.ndarray(shape, dtype='float32', buffer=shm.buf)
+        model = Model(model_name, threads=threads)
+    except Exception as e:
+        # Tell the parent instead of exiting silently; seq None means startup failed
+        results.put((None, None, None, f"worker startup failed: {e}"))
+        if shm is not None:
+            del slots
+            shm.close()
+        return
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot, n, sensitivity, min_p = task
+            try:
+                _, detections = model.predict_batch(slots[slot, :n], sensitivity=sensitivity, min_p=min_p,
+                                                    return_scores=False)
+                results.put((seq, slot, detections, None))
+            except Exception as e:
+                results.put((seq, slot, None, str(e)))
+    finally:
+        del slots
+        shm.close()
+
+class InferencePool:
+    """Runs windows through N worker processes, each with its own Model.
+
+    Windows are copied into a shared-memory array of batch slots, so only
+    small (seq, slot) tuples and the detections cross process boundaries.
+    map() yields each window's detections in input order, using the
+    sensitivity and min_p it is given (min_p defaults to the pool's). Use
+    it as a context manager, or call close(), to stop the workers. A worker
+    that fails to start, fails a batch or dies raises RuntimeError in map().
+    """
+    def __init__(self, model="model_int8", workers=None, threads=None, window_size=144000,
+                 batch_size=4, slots_per_worker=2, min_p=0.1):
+        cpus = os.cpu_count() or 1
+        self.workers = workers or cpus
+        self.threads = threads or max(1, cpus // self.workers)
+        self.batch_size = batch_size
+        self.window_size = window_size
+        self.min_p = min_p
+        n_slots = self.workers * slots_per_worker
+        shape = (n_slots, batch_size, window_size)
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 4)
+        self.slots = np.ndarray(shape, dtype='float32', buffer=self.shm.buf)
+        self.free_slots = list(range(n_slots))
+        self.cond = threading.Condition()
+        self.collecting = False  # a map() call is reading the results queue
+        self.done = {}  # seq -> (detections, error) of finished batches not yet yielded
+        self.next_seq = 0
+        self.failed = None  # set once the pool is unusable
+        self.closed = False
+        self.tasks = mp.Queue()
+        self.results = mp.Queue()
+        self.processes = [
+            mp.Process(target=_pool_worker, daemon=True,
+                       args=(model, self.threads, self.shm.name, shape, self.tasks, self.results))
+            for _ in range(self.workers)
+        ]
+        for p in self.processes:
+            p.start()
+        print(f"Inference pool: {self.workers} workers x {self.threads} threads")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _wait_for(self, ready):
+        # Called with self.cond held. One caller at a time reads the results
+        # queue and files each batch under its seq; the others sleep until then
+        while not ready():
+            if self.failed is not None:
+                raise RuntimeError(self.failed)
+            if self.collecting:
+                self.cond.wait()
+                continue
+            self.collecting = True
+            self.cond.release()
+            try:
+                seq, slot, detections, error = self._receive()
+            except RuntimeError as e:
+                seq, slot, detections, error = None, None, None, str(e)
+            finally:
+                self.cond.acquire()
+                self.collecting = False
+                self.cond.notify_all()
+            if seq is None:
+                self.failed = error
+                raise RuntimeError(error)
+            self.free_slots.append(slot)
+            if error is not None:
+                error = f"Pool inference error on batch {seq}: {error}"
+            self.done[seq] = (detections, error)
+
+    def _receive(self):
+        while True:
+            try:
+                return self.results.get(timeout=1)
+            except queue.Empty:
+                # Nothing to wait for if a worker died without posting
+                dead = [p.exitcode for p in self.processes if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Inference pool worker exited (exit codes {dead})")
+
+    def _submit(self, slot, n, sensitivity, min_p):
+        with self.cond:
+            seq = self.next_seq
+            self.next_seq += 1
+        self.tasks.put((seq, slot, n, sensitivity, min_p))
+        return seq
+
+    def _take(self, seq):
+        # Called with self.cond held, once seq is in self.done
+        detections, error = self.done.pop(seq)
+        if error is not None:
+            raise RuntimeError(error)
+        return detections
+
+    def map(self, windows, sensitivity=1.0, min_p=None):
+        """Yield the detection list for every window, in order.
+
+        Safe to call from several threads at once; their batches share the
+        workers, so each caller's own preprocessing overlaps the others' inference.
+        """
+        min_p = self.min_p if min_p is None else min_p
+        pending = deque()  # this call's batches, oldest first
+        fill = 0
+        slot = None
+        for window in windows:
+            if slot is None:
+                with self.cond:
+                    self._wait_for(lambda: self.free_slots)
+                    slot = self.free_slots.pop()
+            self.slots[slot, fill] = window
+            fill += 1
+            if fill == self.batch_size:
+                pending.append(self._submit(slot, fill, sensitivity, min_p))
+                slot, fill = None, 0
+            while pending and pending[0] in self.done:
+                with self.cond:
+                    detections = self._take(pending.popleft())
+                yield from detections
+        if fill:
+            pending.append(self._submit(slot, fill, sensitivity, min_p))
+        while pending:
+            with self.cond:
+                self._wait_for(lambda: pending[0] in self.done)
+                detections = self._take(pending.popleft())
+            yield from detections
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            for _ in self.processes:
+                self.tasks.put(None)
+            for p in self.processes:
+                p.join(timeout=10)
+                if p.is_alive():
+                    p.terminate()
+                    p.join()
+        finally:
+            del self.slots
+            self.shm.close()
+            self.shm.unlink()
+
+class PoolModel:
+    """Model stand-in that sends predict_batch() through an InferencePool.
+
+    Lets a SlidingWindowDetector run unchanged on the pool; its batch size
+    is raised so each call keeps every worker busy.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        self.tuning = {"batch_size": pool.workers * pool.batch_size * 2}
+
+    def predict_batch(self, windows, sensitivity=1.0, min_p=0.1, return_scores=True):
+        if return_scores:
+            raise ValueError("PoolModel only returns detections")
+        return None, list(self.pool.map(windows, sensitivity=sensitivity, min_p=min_p))
@@ -0,0 +1,324 @@
+"""Replay WAV recordings and sensor traces through the main.py pipeline.
+
+Drives main.run, the same asyncio tasks, inference worker and writers as
+main.main, on an event loop with a simulated clock, so it goes as fast as
+the machine allows and needs no microphone, BME680 or GPIO.
+Reports the real-time factor, per-stage latency, peak RSS and (with
+--trace-alloc) Python/NumPy allocations.
+
+    python replay.py recordings/*.wav [--sensor-trace trace.csv] [--out replay_data]
+"""
+import argparse
+import asyncio
+import csv
+import math
+import os
+import resource
+import selectors
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import numpy as np
+import main as pipeline
+from model import Model
+from detection_log import DetectionLog
+from archive import DailyArchive
+from row_writer import RowWriter
+from wavfile import WavFile
+from sound import InputConditioner
+from sensors import RunningStats
+
+# main.py functions whose latency is reported, by stage name
+TIMED_STAGES = {"process_audio": "audio", "sample_sensors": "sensors", "analyze_audio_data": "bioacoustics_result",
+                "build_cycle_row": "build_row", "write_batch": "write"}
+
+class TraceSensors:
+    """Stands in for SingleReadSensors, one reading per get() call.
+
+    Readings come from a CSV trace (columns temp, pressure, humidity, gas,
+    light and optionally motion_tripped; one row per second, looped) or,
+    without one, from a synthetic diurnal pattern.
+    """
+    KEYS = ["temp", "pressure", "humidity", "gas", "light", "motion_tripped"]
+    STATS_KEYS = ["temp", "pressure", "humidity", "gas", "light"]
+
+    def __init__(self, trace_path=None, start=None, seed=0):
+        self.rows = None
+        self.i = 0
+        self.clock = start or datetime.now()
+        self.rng = np.random.default_rng(seed)
+        self._stats = {k: RunningStats() for k in self.STATS_KEYS}
+        if trace_path:
+            with open(trace_path, newline='') as f:
+                self.rows = [{k: float(v) if v not in ("", None) else None for k, v in row.items() if k in self.KEYS}
+                             for row in csv.DictReader(f)]
+
+    def get(self) -> dict:
+        reading = self._next()
+        for k in self.STATS_KEYS:
+            self._stats[k].update(reading.get(k))
+        return reading
+
+    def stats(self, reset=False) -> dict:
+        result = {k: st.copy() for k, st in self._stats.items()}
+        if reset:
+            self.reset_stats()
+        return result
+
+    def reset_stats(self):
+        for st in self._stats.values():
+            st.reset()
+
+    def _next(self):
+        self.i += 1
+        if self.rows:
+            return dict(self.rows[(self.i - 1) % len(self.rows)])
+        now = self.clock + timedelta(seconds=self.i)
+        day = 2 * np.pi * (now.hour * 3600 + now.minute * 60 + now.second) / 86400
+        return {
+            "temp": 26 + 6 * np.sin(day - np.pi / 2) + self.rng.normal(0, 0.1),
+            "pressure": 1010 + self.rng.normal(0, 0.3),
+            "humidity": 70 - 15 * np.sin(day - np.pi / 2) + self.rng.normal(0, 0.5),
+            "gas": 120000 + self.rng.normal(0, 2000),
+            "light": int(6 <= now.hour < 18),
+            "motion_tripped": bool(self.rng.random() < 0.01),
+        }
+
+class StageTimer:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+
+    @contextmanager
+    def __call__(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latencies[stage].append(time.perf_counter() - t0)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            with self(stage):
+                return fn(*args, **kwargs)
+        return timed
+
+    @contextmanager
+    def patch(self, module, stages):
+        """Time module's functions {name: stage} while inside the block, then put them back."""
+        originals = {name: getattr(module, name) for name in stages}
+        try:
+            for name, stage in stages.items():
+                setattr(module, name, self.wrap(stage, originals[name]))
+            yield
+        finally:
+            for name, fn in originals.items():
+                setattr(module, name, fn)
+
+    def report(self):
+        print(f"{'Stage':<22}{'calls':>8}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for stage, values in self.latencies.items():
+            v = np.array(values)
+            print(f"{stage:<22}{len(v):>8}{v.sum():>10.2f}{v.mean() * 1000:>10.2f}"
+                  f"{np.percentile(v, 95) * 1000:>10.2f}{v.max() * 1000:>10.2f}")
+
+class ReplayClock:
+    """Simulated time for the pipeline's tickers: monotonic() and time() like the time module."""
+    def __init__(self, start):
+        self.start = start.timestamp()
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.start + self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+class ReplaySelector(selectors.DefaultSelector):
+    # When the loop would sleep with no executor job running, jump the clock
+    # instead of waiting; settle() (the inference worker's wait_idle) first
+    # lets inference catch up, as it would in real time on a fast enough Pi
+    def __init__(self, clock, settle=None):
+        super().__init__()
+        self.clock = clock
+        self.settle = settle
+        self.in_flight = 0
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        if self.in_flight or timeout is None:
+            return super().select(None)  # an executor result wakes the loop
+        if self.settle is not None:
+            self.settle()
+        self.clock.advance(timeout)
+        return []
+
+class ReplayLoop(asyncio.SelectorEventLoop):
+    """Event loop on a ReplayClock; runs main.run as fast as the machine allows."""
+    def __init__(self, clock, settle=None):
+        self.clock = clock
+        super().__init__(ReplaySelector(clock, settle))
+
+    def time(self):
+        return self.clock.monotonic()
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self._selector.in_flight += 1
+        future.add_done_callback(self._job_done)
+        return future
+
+    def _job_done(self, future):
+        self._selector.in_flight -= 1
+
+class ReplayStream:
+    """Stands in for sound.Stream: WAV audio "captured" as the replay clock advances."""
+    def __init__(self, paths, sr, clock, timer):
+        self.sr = sr
+        self.clock = clock
+        self.duration = sum(WavFile(path).duration for path in paths)
+        self.delivered = 0
+        self.block = np.zeros(0, dtype='float32')
+        self.pos = 0
+        self.blocks = self._blocks(paths, timer)
+
+    def _blocks(self, paths, timer):
+        conditioner = InputConditioner()
+        for path in paths:
+            wav = WavFile(path)
+            if not wav.frames:
+                continue
+            blocks = wav.blocks(60, sr=self.sr)
+            while True:
+                with timer("read_wav"):
+                    audio = next(blocks, None)
+                if audio is None:
+                    break
+                yield conditioner.process(audio)
+
+    @property
+    def total(self):
+        return int(self.clock.monotonic() * self.sr)
+
+    def read_since(self, cursor):
+        out = np.empty(max(0, self.total - cursor), dtype='float32')
+        filled = 0
+        while filled < len(out):
+            if self.pos == len(self.block):
+                self.block = next(self.blocks, None)
+                self.pos = 0
+                if self.block is None:
+                    self.block = np.zeros(0, dtype='float32')
+                    break
+            n = min(len(out) - filled, len(self.block) - self.pos)
+            out[filled:filled + n] = self.block[self.pos:self.pos + n]
+            filled += n
+            self.pos += n
+        self.delivered += filled
+        return out[:filled], cursor + filled, 0
+
+class NoUsbSync:
+    def notify(self):
+        pass
+
+    def stats(self):
+        return {"bytes_behind": 0, "seconds_behind": 0, "failures": 0, "last_error": None}
+
+def replay(paths, sensors, model, sr=48000, poll_seconds=1.0, cycle_minutes=pipeline.CYCLE_MINUTES,
+           start=None, folder=pipeline.DATA_FOLDER, align=False):
+    timer = StageTimer()
+    start = start or datetime.now()
+    clock = ReplayClock(start)
+    stream = ReplayStream(paths, sr, clock, timer)
+    # Enough cycles to cover the audio; the last one may run on past its end
+    period = int(cycle_minutes * 60)
+    if align:
+        # The first cycle ends at a boundary at least MIN_FIRST_CYCLE away, as in main.cycle_task
+        first = (math.floor(clock.start / period) + 1) * period - clock.start
+        if first < period * pipeline.MIN_FIRST_CYCLE:
+            first += period
+        cycles = 1 + math.ceil(max(0.0, stream.duration - first) / period)
+    else:
+        cycles = math.ceil(stream.duration / period)
+    cycles = max(1, cycles)
+
+    log = DetectionLog(folder, model.CLASSES, pipeline.DETECTION_LOG_FMT)
+    archive = DailyArchive(os.path.join(folder, pipeline.ARCHIVE_FOLDER))
+    row_writer = RowWriter(folder, pipeline.STATIC_HEADER)
+    detector = pipeline.make_detector(model, sr, log=log)
+    detector.infer = timer.wrap("detection", detector.infer)
+    worker = pipeline.InferenceWorker(detector, max_queue=pipeline.INFERENCE_QUEUE_SIZE,
+                                      policy=pipeline.INFERENCE_QUEUE_POLICY)
+    worker.reset(origin=clock.time())
+    loop = ReplayLoop(clock, settle=worker.wait_idle)
+    wall_start = time.perf_counter()
+    try:
+        with timer.patch(pipeline, TIMED_STAGES):
+            loop.run_until_complete(pipeline.run(stream, sensors, worker, detector, log, archive, row_writer,
+                                                 NoUsbSync(), clock=clock, cycles=cycles, cycle_minutes=cycle_minutes,
+                                                 align=align, audio_poll_seconds=poll_seconds))
+        loop.run_until_complete(loop.shutdown_default_executor())
+    finally:
+        loop.close()
+        worker.stop()
+        log.close()
+        row_writer.close()
+    wall = time.perf_counter() - wall_start
+    totals = worker.stats()
+    totals["calls"] = detector.events
+    return timer, stream.delivered / sr, wall, cycles, totals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("wavs", nargs="+")
+    parser.add_argument("--sensor-trace", help="CSV of per-second sensor readings")
+    parser.add_argument("--model", default="model_int8")
+    parser.add_argument("--sr", type=int, default=48000)
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds of audio per loop iteration")
+    parser.add_argument("--cycle-minutes", type=float, default=pipeline.CYCLE_MINUTES)
+    parser.add_argument("--start", help="simulated start time, YYYY-mm-dd HH:MM:SS")
+    parser.add_argument("--out", default="replay_data", help="folder for the CSV output")
+    parser.add_argument("--align", action="store_true", help="end cycles on wall-clock multiples, like main.py")
+    parser.add_argument("--no-write", action="store_true", help="write to a temporary folder and delete it")
+    parser.add_argument("--trace-alloc", action="store_true", help="track allocations (slower)")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S") if args.start else datetime.now()
+    tmp = tempfile.TemporaryDirectory() if args.no_write else None
+    folder = tmp.name if tmp else args.out
+    os.makedirs(folder, exist_ok=True)
+    if args.trace_alloc:
+        tracemalloc.start()
+
+    t0 = time.perf_counter()
+    model = Model(args.model)
+    load_seconds = time.perf_counter() - t0
+    sensors = TraceSensors(args.sensor_trace, start)
+    timer, audio_seconds, wall, cycles, totals = replay(
+        args.wavs, sensors, model, args.sr, args.poll, args.cycle_minutes, start, folder, args.align)
+    if tmp:
+        tmp.cleanup()
+
+    print(f"\nReplayed {audio_seconds:.1f} s of audio ({cycles} cycles) in {wall:.1f} s "
+          f"(model load {load_seconds:.1f} s)")
+    if wall > 0:
+        print(f"Real-time factor: {wall / max(audio_seconds, 1e-9):.3f} ({audio_seconds / wall:.1f}x real time)")
+    print(f"Windows: {totals['submitted']} submitted, {totals['inferred']} inferred, "
+          f"{totals['gated']} gated, {totals['dropped']} dropped, {totals['calls']} calls")
+    timer.report()
+    print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB")
+    if args.trace_alloc:
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"Traced allocations: current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB")
+        for stat in tracemalloc.take_snapshot().statistics("lineno")[:5]:
+            print(f"  {stat}")
+
+if __name__ == "__main__":
+    main()
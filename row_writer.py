@@ -0,0 +1,92 @@
+import csv
+import os
+from datetime import datetime
+
+class RowWriter:
+    """Appends cycle summary rows to the daily CSV without pandas.
+
+    Keeps one file handle open for the current day and writes rows in a
+    fixed column order: the static columns, then one column per species
+    seen in that file, sorted. When a new species shows up the day's file
+    is rewritten once with the wider header (old rows get 0), so every row
+    always matches the header. If a write fails the rows go to a
+    timestamped fallback file next to it instead.
+    """
+    def __init__(self, folder, static_columns):
+        self.folder = folder
+        self.static_columns = list(static_columns)
+        self.filename = None
+        self.handle = None
+        self.writer = None
+        self.species = []
+
+    def _open(self, filename):
+        self.close()
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, filename)
+        self.species = []
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, newline='') as f:
+                header = next(csv.reader(f), [])
+            self.species = [c for c in header if c not in self.static_columns]
+            self.handle = open(path, "a", newline='')
+            self.writer = csv.writer(self.handle)
+        else:
+            self.handle = open(path, "w", newline='')
+            self.writer = csv.writer(self.handle)
+            self.writer.writerow(self.static_columns)
+        self.filename = filename
+
+    def _widen(self, species):
+        # Rewrite the day's file with the new header; rows are remapped by column name
+        path = os.path.join(self.folder, self.filename)
+        self.close()
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            old_header = next(reader, [])
+            old_rows = list(reader)
+        header = self.static_columns + species
+        tmp = path + ".tmp"
+        with open(tmp, "w", newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            wide = 0
+            for old in old_rows:
+                values = dict(zip(old_header, old))
+                # Fields past the old header have no name to remap by; keep them at the end
+                extra = old[len(old_header):]
+                wide += bool(extra)
+                writer.writerow([values.get(c, "" if c in self.static_columns else 0) for c in header] + extra)
+        os.replace(tmp, path)
+        if wide:
+            print(f"Warning: {wide} row(s) in {path} have more fields than the header; extra fields kept at the end")
+        self._open(self.filename)
+
+    def write(self, filename, rows):
+        try:
+            if filename != self.filename or self.handle is None:
+                self._open(filename)
+            seen = {k for r in rows for k in r if k not in self.static_columns}
+            if not seen.issubset(self.species):
+                self._widen(sorted(seen.union(self.species)))
+            for row in rows:
+                self.writer.writerow([row.get(c) for c in self.static_columns] +
+                                     [row.get(s, 0) for s in self.species])
+            self.handle.flush()
+            print(f"Appended {len(rows)} row(s) locally to {os.path.join(self.folder, filename)}")
+        except Exception as e:
+            self.close()
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            fallback = os.path.join(self.folder, f"{filename.split('.')[0]}_{timestamp}.csv")
+            species = sorted({k for r in rows for k in r if k not in self.static_columns})
+            with open(fallback, "w", newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.static_columns + species)
+                for row in rows:
+                    writer.writerow([row.get(c) for c in self.static_columns] + [row.get(s, 0) for s in species])
+            print(f"Write error for {filename}: {e}. Data saved to {fallback} instead.")
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+        self.handle = self.writer = None
@@ -1,5 +1,10 @@
 import time
+import heapq
 import threading
+from array import array
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # --- BME680 Setup ---
 try:
@@ -15,17 +20,121 @@ try:
 except ImportError:
     GPIO = None
 
+# Default polling cadence per channel, seconds
+THP_INTERVAL = 5      # BME680 temperature, pressure, humidity
+GAS_INTERVAL = 30     # BME680 gas resistance (heater cycle, slow)
+LIGHT_INTERVAL = 1    # digital light sensor
+HISTORY = 64          # readings kept per channel
+MOTION_BOUNCE_MS = 200      # PIR edges closer than this are one trip
+MOTION_KEEP_SECONDS = 86400 # motion event timestamps kept for count()
+POLL_THREADS = 8      # channels read at once; a slow read only delays its own channel
+
+class RunningStats:
+    """Count, mean, min, max and variance of a stream in constant memory (Welford)."""
+    __slots__ = ("count", "mean", "min", "max", "_m2")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = None
+        self.min = self.max = None
+        self._m2 = 0.0
+
+    def update(self, x):
+        if x is None:
+            return
+        x = float(x)
+        if self.count == 0:
+            self.count, self.mean, self.min, self.max = 1, x, x, x
+            return
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    @property
+    def variance(self):
+        # Sample variance; None until there are two readings
+        return self._m2 / (self.count - 1) if self.count > 1 else None
+
+    def copy(self):
+        other = RunningStats()
+        other.count, other.mean, other.min, other.max, other._m2 = self.count, self.mean, self.min, self.max, self._m2
+        return other
+
+    def as_dict(self):
+        return {"count": self.count, "mean": self.mean, "min": self.min, "max": self.max, "variance": self.variance}
+
+class Channel:
+    """One sensor channel polled on its own cadence.
+
+    read() returns a dict of readings; the last `history` results are kept
+    with their time.monotonic() timestamps. A reading older than
+    `stale_after` intervals is reported as None. Every reading also feeds
+    one RunningStats per key, reset by the owner at interval boundaries.
+    Channels reading the same device pass the same device_lock, so their
+    reads never interleave.
+    """
+    def __init__(self, name, read, keys, interval, history=HISTORY, stale_after=3, device_lock=None):
+        self.name = name
+        self.read = read
+        self.keys = list(keys)
+        self.interval = interval
+        self.stale_after = stale_after
+        self.buffer = deque(maxlen=history)
+        self.stats = {k: RunningStats() for k in self.keys}
+        self.lock = threading.Lock()
+        self.device_lock = device_lock
+        self.errors = 0
+        self.failing = False
+        self.busy = False  # a poll is running on the sampler's executor
+        self.overruns = 0  # slots skipped because the previous read hadn't finished
+
+    def poll(self):
+        try:
+            if self.device_lock is not None:
+                with self.device_lock:
+                    values = self.read()
+            else:
+                values = self.read()
+            values = {k: values.get(k) for k in self.keys}
+            with self.lock:
+                self.buffer.append((time.monotonic(), values))
+                for k, v in values.items():
+                    self.stats[k].update(v)
+            self.failing = False
+        except Exception as e:
+            self.errors += 1
+            if not self.failing:  # print once per failure streak
+                print(f"{self.name} read error: {e}")
+            self.failing = True
+
+    def latest(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.buffer:
+            t, values = self.buffer[-1]
+            if now - t <= self.interval * self.stale_after:
+                return dict(values)
+        return {k: None for k in self.keys}
+
 class SingleReadSensors:
-    def __init__(self, light_pin=17, motion_pin=27, counting_interval=60):
-        self.samples = []
+    def __init__(self, light_pin=17, motion_pin=27, counting_interval=60,
+                 thp_interval=THP_INTERVAL, gas_interval=GAS_INTERVAL, light_interval=LIGHT_INTERVAL):
         self.light_pin = light_pin
         self.motion_pin = motion_pin
         self.counting_interval = counting_interval  # seconds per abundance "snapshot"
         self._stop_event = threading.Event()
-        self.motion_count = 0
-        self.abundance = 0  # Abundance score for current interval (0 or 1)
+        # Motion trips as a sorted array of time.monotonic() stamps; wall-clock
+        # steps (RTC/NTP sync) can't reorder them
+        self.motion_events = array('d')
+        self._motion_lock = threading.Lock()
+        self._motion_cursor = time.monotonic()  # trips after this are reported by the next get()
         self._last_motion = 0
-        self._start_time = time.time()
+        self.thread = None
 
         # Attempt BME680
         if adafruit_bme680:
@@ -50,94 +159,183 @@ class SingleReadSensors:
         else:
             print("RPi.GPIO not installed (sensors.py)")
 
-        self.thread = threading.Thread(target=self._motion_counter_thread, daemon=True)
-        self.thread.start()
+        # Sampling scheduler: each channel polled on its own cadence
+        self.channels = {}
+        self._schedule = []
+        self._schedule_lock = threading.Lock()
+        self._wake = threading.Event()
+        # Reads run here; the sampler thread only keeps time
+        self._poll_pool = ThreadPoolExecutor(POLL_THREADS, thread_name_prefix="sensor")
+        if self.bme680:
+            bme680_lock = threading.Lock()  # one measurement at a time on the shared BME680
+            self.register("BME680", self._read_thp, ["temp", "pressure", "humidity"], thp_interval,
+                          device_lock=bme680_lock)
+            self.register("BME680 gas", self._read_gas, ["gas"], gas_interval, device_lock=bme680_lock)
+        if GPIO:
+            self.register("Light sensor", self._read_light, ["light"], light_interval)
 
-    def _motion_counter_thread(self):
-        """Thread: counts unique motion events, max 1 per minute."""
-        while not self._stop_event.is_set():
+        if GPIO:
             try:
-                # Edge detection: rising (motion detected)
-                if GPIO:
-                    val = GPIO.input(self.motion_pin)
-                    if val and not self._last_motion:
-                        # rising edge - a new trigger
-                        self.motion_count += 1
-                    self._last_motion = val
+                GPIO.add_event_detect(self.motion_pin, GPIO.RISING, callback=self._on_motion,
+                                      bouncetime=MOTION_BOUNCE_MS)
             except Exception as e:
-                pass
+                # Some kernels refuse edge detection; fall back to polling the pin
+                print(f"PIR edge detection unavailable ({e}), polling instead")
+                self.thread = threading.Thread(target=self._motion_poll_thread, daemon=True)
+                self.thread.start()
+        self.sampler = threading.Thread(target=self._sampler_thread, daemon=True)
+        self.sampler.start()
 
-            # Each full interval, calculate abundance
-            now = time.time()
-            if now - self._start_time >= self.counting_interval:
-                # Abundance score: record if there was at least 1 activation this interval
-                self.abundance = 1 if self.motion_count > 0 else 0
-                self.motion_count = 0  # Reset for next interval
-                self._start_time = now
+    def register(self, name, read, keys, interval, history=HISTORY, device_lock=None):
+        """Poll read() every `interval` seconds; its keys then show up in get().
 
-            time.sleep(0.1)  # ~10 Hz polling for PIR
+        read() runs on a worker thread, so a slow one (e.g. an SCD40 from
+        test-all-sensors.py) doesn't hold up the other channels:
+            sensors.register("SCD40", lambda: {"co2": scd.CO2}, ["co2"], 5)
+        """
+        channel = Channel(name, read, keys, interval, history, device_lock=device_lock)
+        with self._schedule_lock:
+            self.channels[name] = channel
+            heapq.heappush(self._schedule, (time.monotonic(), name))
+        self._wake.set()
+        return channel
 
-    def get(self) -> dict:
-        sensors_dict = {}
+    def _read_thp(self):
+        return {"temp": self.bme680.temperature, "pressure": self.bme680.pressure,
+                "humidity": self.bme680.humidity}
 
-        # --- BME680 readings ---
-        if self.bme680:
-            try:
-                sensors_dict["temp"] = self.bme680.temperature
-                sensors_dict["pressure"] = self.bme680.pressure
-                sensors_dict["humidity"] = self.bme680.humidity
-                sensors_dict["gas"] = self.bme680.gas
-            except Exception as e:
-                sensors_dict["temp"] = sensors_dict["pressure"] = None
-                sensors_dict["humidity"] = sensors_dict["gas"] = None
-                print("BME680 read error:", e)
-        else:
-            sensors_dict["temp"] = sensors_dict["pressure"] = None
-            sensors_dict["humidity"] = sensors_dict["gas"] = None
+    def _read_gas(self):
+        return {"gas": self.bme680.gas}
 
-        # Light sensor (digital)
-        if GPIO:
+    def _read_light(self):
+        return {"light": GPIO.input(self.light_pin)}  # 1=light, 0=dark
+
+    def _poll(self, channel):
+        try:
+            channel.poll()
+        finally:
+            channel.busy = False
+
+    def _sampler_thread(self):
+        """Thread: hands whichever channel is due next to the executor, then reschedules it."""
+        while not self._stop_event.is_set():
+            with self._schedule_lock:
+                due, name = self._schedule[0] if self._schedule else (None, None)
+            now = time.monotonic()
+            if due is None or due > now:
+                self._wake.wait(None if due is None else due - now)
+                self._wake.clear()
+                continue
+            channel = self.channels[name]
+            if channel.busy:
+                channel.overruns += 1  # still reading; at most one poll per channel in flight
+            else:
+                channel.busy = True
+                self._poll_pool.submit(self._poll, channel)
+            with self._schedule_lock:
+                heapq.heappop(self._schedule)
+                # Next slot on the channel's own grid; skip slots already missed
+                due += channel.interval
+                if due <= time.monotonic():
+                    due = time.monotonic() + channel.interval
+                heapq.heappush(self._schedule, (due, name))
+
+    def _on_motion(self, channel=None, now=None):
+        """GPIO callback: record one PIR trip."""
+        now = time.monotonic() if now is None else now
+        with self._motion_lock:
+            self.motion_events.append(now)
+            if now - self.motion_events[0] > MOTION_KEEP_SECONDS * 1.1:
+                # Trim in bulk so appends stay amortised O(1)
+                del self.motion_events[:bisect_left(self.motion_events, now - MOTION_KEEP_SECONDS)]
+
+    def _motion_poll_thread(self):
+        """Thread: rising-edge detection by polling, only when edge events are unavailable."""
+        while not self._stop_event.wait(0.1):
             try:
-                sensors_dict["light"] = GPIO.input(self.light_pin)  # 1=light, 0=dark
+                val = GPIO.input(self.motion_pin)
+                if val and not self._last_motion:
+                    self._on_motion()
+                self._last_motion = val
             except Exception as e:
-                sensors_dict["light"] = None
-                print("Light sensor error:", e)
-        else:
-            sensors_dict["light"] = None
+                pass
+
+    def motion_count(self, start, end=None):
+        """Number of PIR trips with start <= time < end (time.monotonic() seconds)."""
+        with self._motion_lock:
+            hi = len(self.motion_events) if end is None else bisect_left(self.motion_events, end)
+            return hi - bisect_left(self.motion_events, start)
 
-        # Motion abundance over last interval
-        sensors_dict["abundance"] = self.abundance
+    def motion_times(self, start, end=None):
+        """Wall-clock (time.time()) stamps of the trips with start <= time < end (monotonic seconds)."""
+        offset = time.time() - time.monotonic()
+        with self._motion_lock:
+            hi = len(self.motion_events) if end is None else bisect_left(self.motion_events, end)
+            return [t + offset for t in self.motion_events[bisect_left(self.motion_events, start):hi]]
 
-        # Store in samples for get_average()
-        self.samples.append(sensors_dict.copy())
-        # Optional: trim samples list to last N if you want to cap memory use
+    def get(self) -> dict:
+        """Latest reading of every channel; never touches the hardware."""
+        sensors_dict = {"temp": None, "pressure": None, "humidity": None, "gas": None, "light": None}
+        now = time.monotonic()
+        with self._schedule_lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            sensors_dict.update(channel.latest(now))
 
+        # Motion trips since the previous get(), and abundance over the last interval
+        now = time.monotonic()
+        sensors_dict["motion_tripped"] = self.motion_count(self._motion_cursor, now)
+        self._motion_cursor = now
+        sensors_dict["abundance"] = 1 if self.motion_count(now - self.counting_interval, now) else 0
         return sensors_dict
 
-    def get_average(self) -> dict:
-        # Average last interval samples (for e.g. every N minutes)
-        keys = ["temp", "pressure", "humidity", "gas", "light", "abundance"]
-        avg_data = {k: 0 for k in keys}
-        num_samples = len(self.samples)
+    def latest(self, key):
+        """Latest reading for one key without get()'s side effects (None if stale or unknown)."""
+        with self._schedule_lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            if key in channel.keys:
+                return channel.latest()[key]
+        return None
 
-        if num_samples == 0:
-            return avg_data
+    def stats(self, reset=False) -> dict:
+        """RunningStats per key over every reading since the last reset.
 
-        for sample in self.samples:
-            for k in keys:
-                if sample.get(k) is not None:
-                    avg_data[k] += sample[k]
+        With reset=True the interval window is closed and a new one started
+        in the same step, so no reading is counted twice or lost.
+        """
+        result = {}
+        with self._schedule_lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            with channel.lock:
+                for k, st in channel.stats.items():
+                    result[k] = st.copy()
+                    if reset:
+                        st.reset()
+        return result
 
-        for k in keys:
-            avg_data[k] /= num_samples
+    def reset_stats(self):
+        self.stats(reset=True)
 
-        # Reset samples if you’re sampling per-interval
-        self.samples.clear()
+    def get_average(self) -> dict:
+        """Mean of each reading over the interval (None if none), then starts a new interval."""
+        avg_data = {k: st.mean for k, st in self.stats(reset=True).items()}
+        now = time.monotonic()
+        avg_data["abundance"] = 1 if self.motion_count(now - self.counting_interval, now) else 0
         return avg_data
 
+    def history(self, name):
+        """(monotonic time, readings) pairs kept for one channel, oldest first."""
+        return list(self.channels[name].buffer)
+
     def stop(self):
         self._stop_event.set()
-        self.thread.join()
+        self._wake.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.sampler.join()
+        self._poll_pool.shutdown(wait=False)
         if GPIO:
             GPIO.cleanup()
 
@@ -1,6 +1,52 @@
-import sounddevice as sd
 import numpy as np
 import threading
+from scipy.signal import lfilter
+
+# Optional so InputConditioner can be used without an audio device (see replay.py, analyze.py)
+try:
+    import sounddevice as sd
+except ImportError:
+    sd = None
+
+DC_POLE = 0.9995  # DC blocker pole; about a 4 Hz corner at 48 kHz
+AMPLIFICATION_FACTOR = 4  # microphone gain; adjust here
+
+class DCBlocker:
+    """Removes DC with a one-pole high-pass whose state carries across blocks.
+
+    y[n] = x[n] - x[n-1] + pole * y[n-1]. Unlike subtracting each block's own
+    mean, consecutive blocks join without a step, so model windows and STFT
+    frames that span a block boundary see a continuous signal.
+    """
+    def __init__(self, pole=DC_POLE):
+        self.b = np.array([1.0, -1.0])
+        self.a = np.array([1.0, -pole])
+        self.reset()
+
+    def reset(self):
+        self.zi = None
+
+    def process(self, x):
+        if len(x) == 0:
+            return x
+        if self.zi is None:
+            # Start settled on the first block's level instead of ringing from zero
+            self.zi = np.array([-x[0]], dtype='float64')
+        y, self.zi = lfilter(self.b, self.a, x, zi=self.zi)
+        return y.astype('float32')
+
+class InputConditioner:
+    """The gain and DC blocking Stream applies, for audio from files.
+
+    replay.py and analyze.py run recordings through one of these per
+    stream, so their indices and detections compare with field rows.
+    """
+    def __init__(self, gain=AMPLIFICATION_FACTOR, pole=DC_POLE):
+        self.gain = gain
+        self.dc = DCBlocker(pole)
+
+    def process(self, x):
+        return self.dc.process(x * self.gain)
 
 class Stream:
     def __init__(self, duration=3, sr=48000, channels=1, device=None):
@@ -11,9 +57,11 @@ class Stream:
         self.buffer_size = sr * duration
         self.buffer = np.zeros((self.buffer_size, channels), dtype='float32')
         self.idx = 0
+        self.total = 0  # monotonic count of samples written, used as the read cursor
         self.lock = threading.Lock()
         self.device = device
-        self.amplification_factor = 4  # Adjust amplification factor here
+        self.amplification_factor = AMPLIFICATION_FACTOR
+        self.dc = DCBlocker()  # read_since() output, continuous across calls
 
     def audio_callback(self, indata, frames, *_):
         with self.lock:
@@ -28,6 +76,7 @@ class Stream:
                 self.buffer[self.idx:] = amplified_data[:split]
                 self.buffer[:end] = amplified_data[split:]
             self.idx = end
+            self.total += frames
 
     def normalize(self, data):
         # Maintain normalization option as it was
@@ -37,6 +86,29 @@ class Stream:
         with self.lock:
             return self.normalize(np.roll(self.buffer, -self.idx, axis=0).flatten())
 
+    def read_since(self, cursor):
+        """Return (audio, new_cursor, lost) for the samples captured since cursor.
+
+        cursor is the value returned by the previous call (stream.total to
+        start from now). Only new samples are copied out, once. If the caller
+        fell more than the buffer length behind, the overwritten samples are
+        skipped and counted in lost. DC is removed with a running high-pass,
+        so this is meant for a single reader consuming the stream in order.
+        """
+        with self.lock:
+            total = self.total
+            oldest = max(0, total - self.buffer_size)
+            lost = max(0, oldest - cursor)
+            start = max(cursor, oldest)
+            n = total - start
+            out = np.empty((n, self.channels), dtype='float32')
+            if n:
+                first = start % self.buffer_size
+                split = min(n, self.buffer_size - first)
+                out[:split] = self.buffer[first:first + split]
+                out[split:] = self.buffer[:n - split]
+        return self.dc.process(out.reshape(-1)), total, lost
+
     def start(self):
         self.stream = sd.InputStream(
             samplerate=self.sr,
@@ -3,6 +3,7 @@ import time
 from model import Model
 from sound import Stream
 from sensors import SingleReadSensors
+from windows import WindowAssembler
 import bioacoustics
 import sounddevice as sd
 
@@ -47,21 +48,25 @@ def main():
     start_time = time.time()
     try:
         all_audio = []
+        assembler = WindowAssembler(stream.sr * 3)
+        audio_cursor = stream.total
         per_bird_counts = {}
         per_bioacoustics = []
         while time.time() - start_time < RUN_SECONDS:
             t0 = time.time()
-            audio = stream.get_audio()
+            audio, audio_cursor, lost = stream.read_since(audio_cursor)
+            if lost:
+                print(f"[AUDIO] Overrun, {lost} samples lost")
             if audio is None or np.all(audio==0):
                 print("(No new audio chunk)")
             else:
                 print("[AUDIO] New audio chunk shape:", audio.shape)
-                # Run detection anyway
-                preds = model.predict_threshold([audio], min_p=0.15)
-                if preds:
-                    print("[MODEL] Detected:", preds)
-                    for label, _ in preds:
-                        per_bird_counts[label] = per_bird_counts.get(label, 0) + 1
+                for window in assembler.push(audio):
+                    preds = model.predict_threshold([window], min_p=0.15)
+                    if preds:
+                        print("[MODEL] Detected:", preds)
+                        for label, _ in preds:
+                            per_bird_counts[label] = per_bird_counts.get(label, 0) + 1
                 all_audio.append(audio)
 
             # Sensor readings every 10 seconds
@@ -0,0 +1,45 @@
+import pytest
+from ticker import Ticker
+
+class FakeClock:
+    def __init__(self, monotonic=100.0, wall=1_000_000.0):
+        self.mono = monotonic
+        self.offset = wall - monotonic
+
+    def monotonic(self):
+        return self.mono
+
+    def time(self):
+        return self.mono + self.offset
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.mark.parametrize("align", [False, True])
+def test_step_mid_period_stamps_new_wall_time(clock, align):
+    t = Ticker(10, align=align, clock=clock)
+    clock.mono += t.delay() / 2
+    clock.offset += 3600  # RTC/NTP sync halfway through the period
+    clock.mono += t.delay()
+    assert t.tick() == pytest.approx(clock.time())
+    assert t.clock_steps == 1
+
+def test_no_step_stamps_deadline(clock):
+    t = Ticker(10, clock=clock)
+    clock.mono += 10.2
+    assert t.tick() == pytest.approx(clock.time() - 0.2)
+    assert t.clock_steps == 0
+    assert t.misses == 1
+
+def test_short_first_aligned_period_runs_to_next_boundary():
+    clock = FakeClock(wall=6000 - 5)  # 5 s before a 600 s boundary
+    t = Ticker(600, align=True, clock=clock, min_first=300)
+    assert t.delay() == pytest.approx(605)
+    clock.mono += t.delay()
+    assert t.tick() == pytest.approx(6600)
+
+def test_long_first_aligned_period_ends_at_boundary():
+    clock = FakeClock(wall=6000 - 400)
+    t = Ticker(600, align=True, clock=clock, min_first=300)
+    assert t.delay() == pytest.approx(400)
@@ -0,0 +1,101 @@
+import asyncio
+import math
+import time
+
+class Ticker:
+    """Fixed-rate ticks on the monotonic clock, with deadline-miss accounting.
+
+    Deadlines sit on a grid (start + k * period), so the time spent working
+    between ticks is absorbed instead of added to the period. With align=True
+    the grid is placed on wall-clock multiples of the period (period=600 ticks
+    at :00, :10, ...), so units with synced clocks tick together; a first
+    (or re-aligned) period shorter than `min_first` seconds runs on to the
+    following boundary instead. Wall-clock steps (RTC/GPS sync) don't
+    stretch a period; an aligned ticker re-aligns to the new wall time at
+    the next tick. A tick more than `tolerance`
+    seconds late counts as a miss; whole periods overrun are skipped, not
+    replayed in a burst. `clock` supplies monotonic() and time(); it is the
+    time module unless a simulation (see replay.py) drives the ticker.
+    """
+    def __init__(self, period, align=False, tolerance=0.05, step_threshold=1.0, clock=None, min_first=0.0):
+        self.clock = time if clock is None else clock
+        self.period = period
+        self.align = align
+        self.min_first = min_first
+        self.tolerance = tolerance
+        self.step_threshold = step_threshold
+        self.offset = self.clock.time() - self.clock.monotonic()  # wall minus monotonic
+        self.deadline = self._first_deadline(self.clock.monotonic())
+        self.reset_stats()
+
+    def _first_deadline(self, now):
+        if not self.align:
+            return now + self.period
+        wall = now + self.offset
+        first = (math.floor(wall / self.period) + 1) * self.period - wall
+        if first < self.min_first:
+            first += self.period
+        return now + first
+
+    def reset_stats(self):
+        self.ticks = 0
+        self.misses = 0
+        self.skipped = 0
+        self.clock_steps = 0
+        self.total_late = 0.0
+        self.max_late = 0.0
+
+    def delay(self):
+        """Seconds until the next deadline."""
+        return max(0.0, self.deadline - self.clock.monotonic())
+
+    def tick(self):
+        """Account for the tick due now; returns its scheduled wall time."""
+        now = self.clock.monotonic()
+        # Pick up a wall-clock step first, so this tick is already stamped in the new time
+        offset = self.clock.time() - now
+        stepped = abs(offset - self.offset) > self.step_threshold
+        if stepped:
+            self.clock_steps += 1
+            self.offset = offset
+        late = max(0.0, now - self.deadline)
+        scheduled = self.deadline + self.offset
+        self.ticks += 1
+        self.total_late += late
+        self.max_late = max(self.max_late, late)
+        if late > self.tolerance:
+            self.misses += 1
+        # Next slot on the grid; drop the ones already overrun
+        self.deadline += self.period
+        if self.deadline <= now:
+            skip = math.floor((now - self.deadline) / self.period) + 1
+            self.skipped += skip
+            self.deadline += skip * self.period
+        if stepped and self.align:
+            self.deadline = self._first_deadline(now)
+        return scheduled
+
+    def wait(self):
+        time.sleep(self.delay())
+        return self.tick()
+
+    async def wait_async(self):
+        # The event loop must keep the same clock (asyncio's default is time.monotonic), so sleeps line up with the grid
+        await asyncio.sleep(self.delay())
+        return self.tick()
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "clock_steps": self.clock_steps,
+            "mean_late": self.total_late / self.ticks if self.ticks else 0.0,
+            "max_late": self.max_late,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"{s['misses']}/{s['ticks']} late, {s['skipped']} skipped, "
+                f"mean {s['mean_late'] * 1000:.0f} ms, max {s['max_late'] * 1000:.0f} ms"
+                + (f", {s['clock_steps']} clock steps" if s['clock_steps'] else ""))
@@ -0,0 +1,124 @@
+"""Find the fastest TFLite settings for this machine and save them for Model.
+
+Sweeps interpreter threads, batch size and delegate options on the model,
+measures p50/p95 invoke latency and throughput, and writes the best
+configuration to model_tuning.json, which Model reads at startup.
+
+    python tune.py [--model model_int8] [--delegate /path/to/delegate.so]
+"""
+import argparse
+import json
+import os
+import platform
+import time
+import numpy as np
+from model import Model, DEFAULT_DELEGATE, NO_DELEGATE, tuning_file
+
+def machine_name():
+    # The Pi's board revision, or a generic description elsewhere
+    try:
+        with open("/proc/device-tree/model") as f:
+            return f.read().strip("\x00\n")
+    except OSError:
+        return f"{platform.machine()} {platform.processor()}".strip()
+
+def benchmark(model, batch_size, repeats):
+    model.set_batch_size(batch_size)
+    batch = np.random.default_rng(0).standard_normal((batch_size, model.INPUT_SHAPE[1])).astype('float32') * 0.1
+    model.myinterpreter.set_tensor(model.INPUT_LAYER_INDEX, batch)
+    model.myinterpreter.invoke()  # first invoke after a resize is not representative
+    latencies = []
+    for _ in range(repeats):
+        model.myinterpreter.set_tensor(model.INPUT_LAYER_INDEX, batch)
+        t0 = time.perf_counter()
+        model.myinterpreter.invoke()
+        latencies.append(time.perf_counter() - t0)
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return {
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "windows_per_s": round(batch_size / np.mean(latencies), 2),
+    }
+
+def sweep(model_name, threads_list, batch_sizes, delegates, repeats, max_latency):
+    results = []
+    failures = []  # (delegate, threads, batch_size or None, error)
+    for delegate in delegates:
+        for threads in threads_list:
+            try:
+                model = Model(model_name, threads=threads, warmup=False, delegate=delegate)
+            except Exception as e:
+                # Other thread counts may still work with this delegate
+                print(f"Skipping delegate={delegate} threads={threads}: {e}")
+                failures.append((delegate, threads, None, str(e)))
+                continue
+            for batch_size in batch_sizes:
+                try:
+                    r = benchmark(model, batch_size, repeats)
+                except Exception as e:
+                    print(f"Skipping delegate={delegate} threads={threads} batch={batch_size}: {e}")
+                    failures.append((delegate, threads, batch_size, str(e)))
+                    continue
+                r.update(delegate=delegate, threads=threads, batch_size=batch_size)
+                print(f"delegate={delegate:8} threads={threads} batch={batch_size}: "
+                      f"p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms, {r['windows_per_s']} windows/s")
+                results.append(r)
+    if not results:
+        return None, results, failures
+    # Best throughput whose p95 batch latency still fits the live budget
+    eligible = [r for r in results if r["p95_ms"] <= max_latency * 1000] or results
+    best = max(eligible, key=lambda r: (r["windows_per_s"], -r["threads"], -r["batch_size"]))
+    return best, results, failures
+
+def save_tuning(model_name, best, path):
+    try:
+        with open(path) as f:
+            tuning = json.load(f)
+    except (OSError, ValueError):
+        tuning = {}
+    tuning[model_name] = {
+        "threads": best["threads"],
+        "batch_size": best["batch_size"],
+        "delegate": best["delegate"],
+        "p50_ms": best["p50_ms"],
+        "p95_ms": best["p95_ms"],
+        "windows_per_s": best["windows_per_s"],
+        "machine": machine_name(),
+        "tuned_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    with open(path, "w") as f:
+        json.dump(tuning, f, indent=2)
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="model_int8")
+    parser.add_argument("--threads", type=int, nargs="+", default=list(range(1, cpus + 1)))
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--delegate", action="append", default=[],
+                        help="extra external delegate library to try (repeatable)")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--max-latency", type=float, default=3.0,
+                        help="seconds a batch may take at p95 and still keep up live")
+    parser.add_argument("--dry-run", action="store_true", help="don't write the tuning file")
+    args = parser.parse_args()
+
+    delegates = [DEFAULT_DELEGATE, NO_DELEGATE] + args.delegate
+    print(f"Tuning {args.model} on {machine_name()} ({cpus} CPUs)")
+    best, _, failures = sweep(args.model, args.threads, args.batch, delegates, args.repeats, args.max_latency)
+    if failures:
+        print(f"{len(failures)} configuration(s) failed:")
+        for delegate, threads, batch_size, error in failures:
+            print(f"  delegate={delegate} threads={threads}" + (f" batch={batch_size}" if batch_size else "") + f": {error}")
+    if best is None:
+        print("No configuration ran; tuning file left unchanged")
+        return
+    print(f"Best: delegate={best['delegate']} threads={best['threads']} batch={best['batch_size']} "
+          f"({best['windows_per_s']} windows/s, p95 {best['p95_ms']} ms)")
+    if not args.dry_run:
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), tuning_file)
+        save_tuning(args.model, best, path)
+        print(f"Saved to {path}")
+
+if __name__ == "__main__":
+    main()
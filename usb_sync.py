@@ -0,0 +1,198 @@
+import os
+import shutil
+import threading
+import time
+
+CHECK_BYTES = 64 * 1024  # bytes compared at each end of a prefix found on the stick
+
+class UsbSync:
+    """Background mirror of the local data folder onto the USB stick.
+
+    A worker thread walks local_folder, appends only the bytes each file
+    gained since the last pass to the same path under mount_point, and
+    fsyncs the touched files once per pass. A file that shrank or was
+    replaced (e.g. a finalized archive) is copied again in full, and so is
+    one whose copy found on the stick after a reboot doesn't match the
+    local bytes. Files deleted locally (e.g. the archive's .parts staging)
+    are deleted from the stick too. Failures (stick missing, mount error,
+    I/O error) are retried with exponential backoff; the measurement loop
+    never waits on the stick. stats() reports how far behind the copy is
+    and how often it failed.
+    """
+    def __init__(self, local_folder, mount_point, mount=None, interval=30, max_backoff=600):
+        self.local_folder = local_folder
+        self.mount_point = mount_point
+        self.mount = mount  # callable that makes sure the stick is mounted
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.synced = {}  # relative path -> (inode, bytes copied)
+        self.seen = set()  # relative paths found locally on the last pass
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.bytes_copied = 0
+        self.bytes_behind = 0
+        self.last_in_sync = time.time()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._sync_thread, daemon=True)
+        self.thread.start()
+
+    def notify(self):
+        """Ask for a pass soon, e.g. right after new rows were written."""
+        self._wake.set()
+
+    def _local_files(self):
+        for root, dirs, files in os.walk(self.local_folder):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue  # written and renamed into place by archive.py
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, self.local_folder), path
+
+    def _prefix_matches(self, path, dest, size):
+        # Compare the head and tail of the stick's copy with the same bytes locally
+        with open(path, "rb") as a, open(dest, "rb") as b:
+            for offset in sorted({0, max(0, size - CHECK_BYTES)}):
+                n = min(CHECK_BYTES, size - offset)
+                a.seek(offset)
+                b.seek(offset)
+                if a.read(n) != b.read(n):
+                    return False
+        return True
+
+    def _pending(self):
+        pending = []
+        behind = 0
+        self.seen = set()
+        for rel, path in self._local_files():
+            self.seen.add(rel)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            inode, done = self.synced.get(rel, (None, None))
+            if done is None:
+                # First look since boot: keep what's on the stick only if it is
+                # a prefix of the local file, otherwise copy it again in full
+                dest = os.path.join(self.mount_point, rel)
+                done = os.path.getsize(dest) if os.path.isfile(dest) else 0
+                inode = st.st_ino
+                try:
+                    if done > st.st_size or (done and not self._prefix_matches(path, dest, done)):
+                        done = 0
+                except OSError:
+                    done = 0
+            if inode != st.st_ino or st.st_size < done:
+                done = 0  # replaced or truncated locally
+            if st.st_size > done:
+                pending.append((rel, path, st.st_ino, done, st.st_size))
+                behind += st.st_size - done
+            else:
+                self.synced[rel] = (st.st_ino, done)
+        return pending, behind
+
+    def _prune(self):
+        """Delete stick copies of files that are gone locally."""
+        if not os.path.isdir(self.local_folder):
+            return  # local storage missing, not emptied
+        stale = [rel for rel in self.synced if rel not in self.seen]
+        for rel in stale:
+            del self.synced[rel]
+            try:
+                os.remove(os.path.join(self.mount_point, rel))
+            except FileNotFoundError:
+                pass
+        # Archive staging folders compacted while the stick was away (or before a reboot)
+        for root, dirs, files in os.walk(self.mount_point):
+            for name in list(dirs):
+                rel = os.path.relpath(os.path.join(root, name), self.mount_point)
+                if name.endswith(".parts") and not os.path.isdir(os.path.join(self.local_folder, rel)):
+                    shutil.rmtree(os.path.join(root, name))
+                    dirs.remove(name)
+        for rel in stale:
+            parent = os.path.dirname(os.path.join(self.mount_point, rel))
+            if parent != self.mount_point and os.path.isdir(parent) and not os.listdir(parent):
+                os.rmdir(parent)
+
+    def sync_once(self):
+        if self.mount is not None:
+            self.mount()
+        if not os.path.ismount(self.mount_point):
+            raise OSError(f"{self.mount_point} is not mounted")
+        pending, behind = self._pending()
+        self._prune()
+        with self.lock:
+            self.bytes_behind = behind
+        touched = []
+        try:
+            for rel, path, inode, done, size in pending:
+                dest = os.path.join(self.mount_point, rel)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                with open(path, "rb") as src:
+                    if done == 0:
+                        dst = open(dest, "wb")
+                    else:
+                        dst = open(dest, "r+b")
+                        dst.seek(done)
+                    touched.append(dst)
+                    src.seek(done)
+                    shutil.copyfileobj(src, dst, length=1 << 20)
+                    dst.truncate()
+                    copied = dst.tell() - done
+                self.synced[rel] = (inode, done + copied)
+                with self.lock:
+                    self.bytes_copied += copied
+                    self.bytes_behind -= min(copied, self.bytes_behind)
+        finally:
+            # One fsync per touched file per pass, not per write
+            for dst in touched:
+                try:
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                finally:
+                    dst.close()
+        with self.lock:
+            if self.bytes_behind == 0:
+                self.last_in_sync = time.time()
+
+    def _sync_thread(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sync_once()
+                self.consecutive_failures = 0
+                delay = self.interval
+            except Exception as e:
+                with self.lock:
+                    self.failures += 1
+                    self.consecutive_failures += 1
+                    self.last_error = str(e)
+                delay = min(self.max_backoff, self.interval * 2 ** self.consecutive_failures)
+                print(f"USB sync error: {e}. Retrying in {delay:.0f} s.")
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "bytes_behind": self.bytes_behind,
+                "seconds_behind": 0 if self.bytes_behind == 0 else time.time() - self.last_in_sync,
+                "bytes_copied": self.bytes_copied,
+                "failures": self.failures,
+                "consecutive_failures": self.consecutive_failures,
+                "last_error": self.last_error,
+            }
+
+    def stop(self, timeout=10):
+        # Give the stick one last chance to catch up before shutdown
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        self._wake.set()
+        self.thread.join(timeout)
+        if not self.thread.is_alive():
+            try:
+                self.sync_once()
+            except Exception as e:
+                print(f"USB sync error on stop: {e}")
@@ -0,0 +1,99 @@
+import os
+import struct
+import numpy as np
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+class WavFile:
+    """Memory-mapped WAV reader.
+
+    The sample data is mapped rather than loaded, so a file of any length
+    costs only the blocks currently being converted. blocks() yields mono
+    float32 blocks in [-1, 1], resampled to `sr` if it differs from the
+    file's rate.
+    """
+    def __init__(self, path):
+        self.path = path
+        fmt, self.sr, self.channels, bits, offset, size = self._parse_header(path)
+        self.sample_width = bits // 8
+        # Recordings cut short by a power loss often carry a wrong data size
+        size = min(size, os.path.getsize(path) - offset)
+        self.frames = size // (self.sample_width * self.channels)
+
+        if fmt == WAVE_FORMAT_PCM and bits == 8:
+            dtype, self.scale, self.shift = np.uint8, 1 / 128.0, 128
+        elif fmt == WAVE_FORMAT_PCM and bits == 16:
+            dtype, self.scale, self.shift = np.dtype('<i2'), 1 / 32768.0, 0
+        elif fmt == WAVE_FORMAT_PCM and bits == 24:
+            dtype, self.scale, self.shift = np.uint8, 1 / 8388608.0, 0
+        elif fmt == WAVE_FORMAT_PCM and bits == 32:
+            dtype, self.scale, self.shift = np.dtype('<i4'), 1 / 2147483648.0, 0
+        elif fmt == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+            dtype, self.scale, self.shift = np.dtype(f'<f{bits // 8}'), 1.0, 0
+        else:
+            raise ValueError(f"{path}: unsupported WAV format {fmt} with {bits} bits")
+
+        shape = (self.frames, self.channels, 3) if bits == 24 else (self.frames, self.channels)
+        self.data = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape) if self.frames else None
+
+    @staticmethod
+    def _parse_header(path):
+        with open(path, 'rb') as f:
+            riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+            if riff != b'RIFF' or wave != b'WAVE':
+                raise ValueError(f"{path}: not a RIFF/WAVE file")
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"{path}: no data chunk")
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ':
+                    body = f.read(chunk_size)
+                    fmt, channels, sr, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                    if fmt == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                        fmt = struct.unpack('<H', body[24:26])[0]
+                elif chunk_id == b'data':
+                    if fmt is None:
+                        raise ValueError(f"{path}: data chunk before fmt chunk")
+                    return fmt, sr, channels, bits, f.tell(), chunk_size
+                else:
+                    f.seek(chunk_size, 1)
+                if chunk_size % 2:
+                    f.seek(1, 1)  # chunks are word aligned
+
+    @property
+    def duration(self):
+        return self.frames / self.sr
+
+    def read(self, start, frames):
+        """Return frames [start, start+frames) as mono float32."""
+        raw = self.data[start:start + frames]
+        if self.sample_width == 3:
+            raw = raw.astype(np.int32)
+            raw = ((raw[..., 0] | (raw[..., 1] << 8) | (raw[..., 2] << 16)) << 8) >> 8
+        block = raw.astype(np.float32)
+        if self.shift:
+            block -= self.shift
+        block *= self.scale
+        return block.mean(axis=1) if self.channels > 1 else block[:, 0]
+
+    def blocks(self, block_seconds=60, sr=None):
+        """Yield consecutive mono float32 blocks of about block_seconds.
+
+        Resampling runs as one stream over the whole file (soxr keeps the
+        filter state between blocks), so block boundaries leave no edge
+        artifacts; the output matches resampling the file in one go.
+        """
+        block_frames = int(block_seconds * self.sr)
+        stream = None
+        if sr and sr != self.sr:
+            import soxr  # librosa's default resampler
+            stream = soxr.ResampleStream(self.sr, sr, 1, dtype='float32', quality='HQ')
+        for start in range(0, self.frames, block_frames):
+            block = self.read(start, block_frames)
+            if stream is not None:
+                block = stream.resample_chunk(block, last=start + block_frames >= self.frames)
+            yield block
@@ -0,0 +1,68 @@
+import numpy as np
+
+class WindowAssembler:
+    """Cuts a stream of audio blocks into fixed-size model windows.
+
+    Samples are copied once into a preallocated float32 buffer of twice the
+    window size; complete windows are handed out as views into it, every
+    `hop` samples (hop < window_size gives overlapping windows). Nothing is
+    allocated per push, so memory stays constant however long it runs.
+    A window view is only valid until the next call to push().
+    """
+    def __init__(self, window_size, hop=None):
+        hop = window_size if hop is None else int(hop)
+        if not 0 < hop <= window_size:
+            raise ValueError(f"hop must be in (0, {window_size}], got {hop}")
+        self.window_size = window_size
+        self.hop = hop
+        self.capacity = 2 * window_size
+        self.buffer = np.zeros(self.capacity, dtype='float32')
+        self.reset()
+
+    def reset(self):
+        self.start = 0  # first sample of the next window
+        self.end = 0    # one past the last buffered sample
+        self.position = 0  # stream offset of the next window since reset()
+        self.windows = 0
+
+    def set_hop(self, hop):
+        hop = int(hop)
+        if not 0 < hop <= self.window_size:
+            raise ValueError(f"hop must be in (0, {self.window_size}], got {hop}")
+        self.hop = hop
+
+    def skip(self, n):
+        """Account for n samples missing from the stream (e.g. an audio overrun).
+
+        The partial window before the gap is dropped and position moves past
+        the gap, so windows after it keep their true stream offsets.
+        """
+        self.position += self.end - self.start + n
+        self.start = self.end = 0
+
+    def buffered(self):
+        return self.end - self.start
+
+    def _compact(self):
+        # end - start < window_size <= start here, so the regions never overlap
+        n = self.end - self.start
+        self.buffer[:n] = self.buffer[self.start:self.end]
+        self.start, self.end = 0, n
+
+    def push(self, block):
+        """Add a block of samples and yield every window it completes."""
+        pos = 0
+        total = len(block)
+        while pos < total:
+            if self.end == self.capacity:
+                self._compact()
+            n = min(total - pos, self.capacity - self.end)
+            self.buffer[self.end:self.end + n] = block[pos:pos + n]
+            self.end += n
+            pos += n
+            while self.end - self.start >= self.window_size:
+                yield self.buffer[self.start:self.start + self.window_size]
+                hop = self.hop
+                self.start += hop
+                self.position += hop
+                self.windows += 1